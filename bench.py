@@ -0,0 +1,141 @@
+import sys
+import time
+import pickle
+import argparse
+from src import regex, nfa_to_dfa, dfa_minimizer, position
+
+KEYWORDS = ['if', 'else', 'elif', 'while', 'for', 'in', 'def', 'class', 'return', 'yield',
+            'import', 'from', 'as', 'with', 'try', 'except', 'finally', 'raise', 'pass', 'break']
+
+# 基准测试用的正则表达式：(名称, 正则表达式)
+CASES = [
+    ('identifier', '[a-zA-Z_][a-zA-Z0-9_]*'),
+    ('number', '[0-9]+(.[0-9]+)?(e[\\+\\-]?[0-9]+)?'),
+    ('keywords', '|'.join(KEYWORDS)),
+    ('nested', '((a|b)*c(d|e)*)*f'),
+    ('nth-from-end', '(a|b)*a' + '(a|b)' * 8),
+    ('long-sequence', 'abcdefghij' * 20),
+]
+
+# 计时，返回(结果, 最短耗时秒数)
+def timed(function, repeat):
+    best = None
+    for i in range(repeat):
+        begin = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - begin
+        best = seconds if best is None else min(best, seconds)
+    return result, best
+
+# Thompson构造 + init_closure + 子集构造
+def thompson(pattern):
+    return nfa_to_dfa.convert(regex.parse(pattern))
+
+# 位置自动机直接构造DFA
+def direct(pattern):
+    return position.convert(pattern)
+
+# Glushkov NFA（无epsilon边） + 子集构造
+def glushkov(pattern):
+    return nfa_to_dfa.convert(position.parse(pattern))
+
+ENGINES = [('thompson', thompson), ('position', direct), ('glushkov', glushkov)]
+
+# 并行子集构造的基准：倒数第14个字符为a，DFA有2^15+1个状态
+PARALLEL_CASE = ('(a|b|c|d)*a(a|b|c|d){13}', '(a|b|c|d)*a' + '(a|b|c|d)' * 13)
+
+# 在主进程中模拟并行子集构造：按workers切块后逐块计时，进程间传递的数据做一次pickle往返，
+# 返回(DFA, 各层中每块的计算秒数, 总秒数)
+def simulate_parallel(nfa, workers, min_frontier):
+    converter = nfa_to_dfa._ParallelNFAToDFA(workers, min_frontier)
+    levels = list()
+
+    def expand(frontier):
+        if len(frontier) < min_frontier:
+            return nfa_to_dfa._expand_masks(converter.moves, frontier)
+        size = -(-len(frontier) // (workers * 4))
+        seconds = list()
+        result = list()
+        for i in range(0, len(frontier), size):
+            chunk = pickle.loads(pickle.dumps(frontier[i:i + size]))
+            begin = time.perf_counter()
+            edges = nfa_to_dfa._expand_masks(converter.moves, chunk)
+            seconds.append(time.perf_counter() - begin)
+            result.extend(pickle.loads(pickle.dumps(edges)))
+        levels.append(seconds)
+        return result
+
+    begin = time.perf_counter()
+    converter.nfa = nfa
+    converter.closure_array = converter.init_closure()
+    converter.moves = converter.init_moves()
+    converter.expand = expand
+    mask_graph = converter.nfa_to_dfa_mask_graph(nfa_to_dfa._to_mask(converter.closure(0)))
+    dfa = converter.mask_graph_to_dfa(mask_graph, (set(nfa.finals),))[0]
+    return dfa, levels, time.perf_counter() - begin
+
+# 并行部分按块的提交顺序分给最早空闲的工作进程，返回完成时间
+def schedule(chunk_seconds, workers):
+    free = [0.0] * workers
+    for seconds in chunk_seconds:
+        index = free.index(min(free))
+        free[index] += seconds
+    return max(free)
+
+# 比较顺序子集构造和并行子集构造，并由模拟结果估计各进程数下的耗时
+def bench_parallel(workers, min_frontier):
+    name, pattern = PARALLEL_CASE
+    nfa = regex.parse(pattern)
+    layout = lambda dfa: [[(edge.val, edge.dst) for edge in state.edges] for state in dfa.states]
+    dfa, sequential_seconds = timed(lambda: nfa_to_dfa.convert(nfa), 1)
+    print('%s: %d NFA states, %d DFA states' % (name, len(nfa.states), len(dfa.states)))
+    print('%-34s %8.3f s' % ('convert (frozenset)', sequential_seconds))
+    bitset, bitset_seconds = timed(lambda: nfa_to_dfa.convert_parallel(nfa, workers=1), 1)
+    assert layout(bitset) == layout(dfa)
+    print('%-34s %8.3f s' % ('convert_parallel, 1 worker (bitset)', bitset_seconds))
+
+    print()
+    print('%-8s %8s %10s %10s %12s %11s %12s' % ('workers', 'levels', 'chunks s', 'parent s',
+                                                  'projected s', 'vs convert', 'vs 1 worker'))
+    for count in (2, 4, 8, 16):
+        simulated, levels, seconds = simulate_parallel(nfa, count, min_frontier)
+        assert layout(simulated) == layout(dfa)
+        parallel = sum(sum(level) for level in levels)
+        projected = seconds - parallel + sum(schedule(level, count) for level in levels)
+        print('%-8d %8d %10.3f %10.3f %12.3f %10.2fx %11.2fx' % (
+            count, len(levels), parallel, seconds - parallel, projected,
+            sequential_seconds / projected, bitset_seconds / projected))
+
+    if workers > 1:
+        result, seconds = timed(lambda: nfa_to_dfa.convert_parallel(nfa, workers=workers), 1)
+        assert layout(result) == layout(dfa)
+        print()
+        print('convert_parallel with %d workers: %.3f s (%.2fx vs convert, %.2fx vs 1 worker)'
+              % (workers, seconds, sequential_seconds / seconds, bitset_seconds / seconds))
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare regex-to-DFA construction engines.')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per case, the fastest is reported')
+    parser.add_argument('--parallel', action='store_true',
+                        help='Benchmark the parallel subset construction instead')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='With --parallel, also run a real process pool of this size')
+    parser.add_argument('--min-frontier', type=int, default=512,
+                        help='With --parallel, smallest level that is split into chunks')
+    args = parser.parse_args()
+
+    if args.parallel:
+        bench_parallel(args.workers, args.min_frontier)
+        return
+
+    print('%-14s %-9s %8s %8s %10s %10s' % ('case', 'engine', 'dfa', 'mindfa', 'build ms', 'min ms'))
+    for name, pattern in CASES:
+        for engine, build in ENGINES:
+            dfa, build_seconds = timed(lambda: build(pattern), args.repeat)
+            mindfa, min_seconds = timed(lambda: dfa_minimizer.minimize(dfa), args.repeat)
+            print('%-14s %-9s %8d %8d %10.2f %10.2f' % (name, engine, len(dfa.states),
+                  len(mindfa.states), build_seconds * 1000, min_seconds * 1000))
+        sys.stdout.flush()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import pickle
+import time
+import argparse
+from bench import timed
+from src import lexer
+
+RULES = [('ID', '[a-z][a-z0-9]*'), ('NUM', '[0-9]+'), ('STR', '"[a-z ]*"'),
+         ('OP', '[=\\+]'), ('WS', '[ \n]+')]
+LINE = 'abc = "x y z" + 123\n'
+
+# 在主进程中逐块模拟工作进程，返回(各块推测扫描的秒数, 主进程串行部分的秒数, 结果)
+# 串行部分包括发送文本块、接收结果数组（pickle往返）和拼接
+def simulate(rules, text, chunk_size, overlap):
+    bounds = list(range(0, len(text), chunk_size)) + [len(text)]
+    lexer._init_worker(rules.table, rules.accept)
+    chunk_seconds = list()
+    serial = 0.0
+    results = list()
+    for start, stop in zip(bounds, bounds[1:]):
+        limit = min(len(text), stop + overlap)
+        begin = time.perf_counter()
+        chunk = pickle.loads(pickle.dumps(text[start:limit]))
+        serial += time.perf_counter() - begin
+        begin = time.perf_counter()
+        result = lexer._lex_chunk(chunk, start, stop - start, limit == len(text))
+        chunk_seconds.append(time.perf_counter() - begin)
+        begin = time.perf_counter()
+        results.append(pickle.loads(pickle.dumps(result)))
+        serial += time.perf_counter() - begin
+    spans, stitch_seconds = timed(lambda: rules.stitch(text, bounds, results), 1)
+    return chunk_seconds, serial + stitch_seconds, spans
+
+# 按提交顺序把各块分给最早空闲的工作进程，返回并行部分的完成时间
+def schedule(chunk_seconds, workers):
+    free = [0.0] * workers
+    for seconds in chunk_seconds:
+        index = free.index(min(free))
+        free[index] += seconds
+    return max(free)
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how parallel lexing scales.')
+    parser.add_argument('--lines', type=int, default=200000, help='Copies of the sample line')
+    parser.add_argument('--chunk-size', type=int, default=1 << 18)
+    parser.add_argument('--overlap', type=int, default=4096)
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Also time spans_parallel with a real process pool of this size')
+    args = parser.parse_args()
+
+    rules = lexer.Lexer(RULES)
+    text = LINE * args.lines
+    spans, spans_seconds = timed(lambda: rules.spans(text), 1)
+    tokens, tokenize_seconds = timed(lambda: list(rules.tokenize(text)), 1)
+    materialized, materialize_seconds = timed(lambda: list(rules.materialize(text, spans)), 1)
+    assert materialized == tokens
+    print('%d chars, %d tokens' % (len(text), len(tokens)))
+    print('%-28s %10.3f s' % ('tokenize (Token objects)', tokenize_seconds))
+    print('%-28s %10.3f s' % ('spans (int array)', spans_seconds))
+    print('%-28s %10.3f s' % ('materialize spans to Token', materialize_seconds))
+
+    chunk_seconds, serial_seconds, parallel_spans = simulate(rules, text, args.chunk_size,
+                                                             args.overlap)
+    assert parallel_spans == spans
+    print('%d chunks: scan %.3f s in total, parent %.3f s (pickle round trips and stitch)'
+          % (len(chunk_seconds), sum(chunk_seconds), serial_seconds))
+    print()
+    print('%-8s %12s %10s' % ('workers', 'projected s', 'speedup'))
+    for workers in (1, 2, 4, 8, 16):
+        seconds = schedule(chunk_seconds, workers) + serial_seconds
+        print('%-8d %12.3f %9.2fx' % (workers, seconds, spans_seconds / seconds))
+
+    if args.workers:
+        result, seconds = timed(lambda: rules.spans_parallel(text, args.workers, args.chunk_size,
+                                                             args.overlap), 1)
+        assert result == spans
+        print()
+        print('spans_parallel with %d workers: %.3f s (%.2fx)'
+              % (args.workers, seconds, spans_seconds / seconds))
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,37 @@
 import sys
 import os
 import argparse
-from src import regex, nfa_to_dfa, dfa_minimizer
+from src import nfa_to_dfa, dfa_minimizer, nfa_passes, engines
 from src.utils import get_dot_file_path, get_image_file_path, clear_directory, dump
 
-# Ensure the res/dot and res/png directories exist
-os.makedirs('res/dot', exist_ok=True)
-os.makedirs('res/img', exist_ok=True)
-
 def parse_args():
     parser = argparse.ArgumentParser(description='Process regular expressions and generate finite automata.')
     parser.add_argument('regex', type=str, help='The regular expression to parse')
     parser.add_argument('conversion', choices=['minidfa', 'dfa', 'nfa'], help='Type of conversion to perform')
     parser.add_argument('--dot', action='store_true', help='Generate DOT files')
     parser.add_argument('--png', action='store_true', help='Generate PNG files')
+    parser.add_argument('--passes', type=str, nargs='?', const=','.join(nfa_passes.DEFAULT_PASSES),
+                        help='Comma-separated NFA passes to run before subset construction')
+    parser.add_argument('--engine', choices=list(engines.ENGINES), default=engines.DEFAULT_ENGINE,
+                        help='Thompson NFA + subset construction, or position automaton (followpos)')
     return parser.parse_args()
 
 def main():
     args = parse_args()
     
-    # Clear the output directories
-    clear_directory('res/dot')
-    clear_directory('res/img')
+    # Clear the output directories, only when something is going to be exported
+    if args.dot or args.png:
+        clear_directory('res/dot')
+        clear_directory('res/img')
     
     # Parse the regular expression into an NFA
-    nfa = regex.parse(args.regex)
+    nfa = engines.to_nfa(args.regex, args.engine)
+    
+    # Optionally optimize the NFA and report what each pass bought
+    if args.passes:
+        manager = nfa_passes.PassManager(args.passes.split(','))
+        nfa, _ = manager.run(nfa, (set(nfa.finals),))
+        print(manager.format_report())
     # Print attributes for debugging
     # print(f"NFA attributes: {nfa.__dict__}")
     
@@ -36,8 +43,11 @@ def main():
             dump(nfa, nfa_dot_path)
         
         if args.conversion in ['minidfa', 'dfa']:
-            # Convert the NFA to a DFA
-            dfa = nfa_to_dfa.convert(nfa)
+            # Convert the NFA to a DFA, the position engine builds it straight from followpos
+            if args.engine == 'position' and not args.passes:
+                dfa = engines.to_dfa(args.regex, args.engine, minimize=False)
+            else:
+                dfa = nfa_to_dfa.convert(nfa)
             
             # Save the DFA to a DOT file if requested
             if args.dot:
@@ -56,7 +66,8 @@ def main():
                     dump(mindfa, mindfa_dot_path)
         
         # Optionally convert DOT files to PNG files
-        if args.png:
+        if args.png and os.path.isdir('res/dot'):
+            os.makedirs('res/img', exist_ok=True)
             for dot_file in os.listdir('res/dot'):
                 if dot_file.endswith('.dot'):
                     dot_path = get_dot_file_path(dot_file)
@@ -37,7 +37,8 @@ def generate_automata():
                     mindfa_dot_path = get_dot_file_path('mindfa.dot')
                     dump(mindfa, mindfa_dot_path)
         
-        if generate_png:
+        if generate_png and os.path.isdir('res/dot'):
+            os.makedirs('res/img', exist_ok=True)
             for dot_file in os.listdir('res/dot'):
                 if dot_file.endswith('.dot'):
                     dot_path = get_dot_file_path(dot_file)
@@ -0,0 +1,18 @@
+import importlib
+
+# 子模块在第一次访问时才导入，import src 不做任何文件系统操作，也不加载用不到的引擎
+_SUBMODULES = ('fsa', 'regex', 'nfa_to_dfa', 'dfa_minimizer', 'position', 'engines', 'nfa_passes',
+               'canonical', 'search', 'product', 'lexer', 'capture', 'profiler', 'shared', 'utils')
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+def __dir__():
+    return sorted(list(globals()) + list(_SUBMODULES))
+
+# 外部接口函数，用指定的引擎（'thompson'或'position'）把正则表达式编译为最小DFA
+def compile(pattern: str, engine='thompson', minimize=True):
+    from . import engines
+    return engines.to_dfa(pattern, engine, minimize)
@@ -0,0 +1,128 @@
+import hashlib
+import json
+from collections import deque
+from .fsa import FSA
+from . import regex, nfa_to_dfa, dfa_minimizer
+
+# 指纹到共享的规范DFA，等价的正则表达式共用同一份编译结果
+_registry = dict()
+# 正则表达式到指纹的缓存，重复编译同一个字符串时直接命中
+_pattern_fingerprints = dict()
+
+# 规范化类，从起始状态按排序后的标签广度优先重新编号
+class _Canonicalizer:
+    def canonicalize(self, dfa: FSA, final_sets):
+        self.dfa = dfa
+        self.final_sets = final_sets
+        order = self.bfs_order()
+        return self.build(order)
+
+    # 广度优先确定新编号，跳过无法到达终止状态的状态
+    def bfs_order(self):
+        self.live = live = self.dfa.live_states()
+        to_new_state = {0: 0}
+        work = deque([0])
+        while work:
+            src = work.popleft()
+            for edge in sorted(self.dfa.states[src].edges, key=lambda e: e.val):
+                if edge.dst in live and edge.dst not in to_new_state:
+                    to_new_state[edge.dst] = len(to_new_state)
+                    work.append(edge.dst)
+        return to_new_state
+
+    # 按新编号构建规范DFA，只保留指向活状态的边（死的起始状态也不保留自环）
+    def build(self, to_new_state):
+        dfa = FSA()
+        for i in range(len(to_new_state) - 1):
+            dfa.add_state()
+        new_final_sets = [set() for i in range(len(self.final_sets))]
+        for old, new in sorted(to_new_state.items(), key=lambda item: item[1]):
+            for final_set_index, final_set in enumerate(self.final_sets):
+                if old in final_set:
+                    dfa.add_final(new)
+                    new_final_sets[final_set_index].add(new)
+                    break
+            for edge in sorted(self.dfa.states[old].edges, key=lambda e: e.val):
+                if edge.dst in self.live:
+                    dfa.add_edge(new, to_new_state[edge.dst], edge.val)
+        return dfa, new_final_sets
+
+# 外部接口函数，返回DFA的规范形式
+def canonicalize(dfa: FSA, final_sets=None):
+    if final_sets is None:
+        return _Canonicalizer().canonicalize(dfa, (set(dfa.finals),))[0]
+    return _Canonicalizer().canonicalize(dfa, final_sets)
+
+# 外部接口函数，计算最小DFA的稳定指纹（与状态编号和边的顺序无关）
+def fingerprint(dfa: FSA, final_sets=None) -> str:
+    if final_sets is None:
+        final_sets = (set(dfa.finals),)
+    dfa, final_sets = _Canonicalizer().canonicalize(dfa, final_sets)
+    rows = list()
+    for index, state in enumerate(dfa.states):
+        rule = next((i for i, final_set in enumerate(final_sets)
+                     if index in final_set), -1)
+        rows.append([rule, [[edge.val, edge.dst] for edge in state.edges]])
+    data = json.dumps([len(final_sets), rows], ensure_ascii=False)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+# 外部接口函数，返回与dfa等价的共享规范DFA，相同语言只保存一份
+def intern(dfa: FSA, final_sets=None):
+    key = fingerprint(dfa, final_sets)
+    if key not in _registry:
+        _registry[key] = canonicalize(dfa, final_sets)
+    return _registry[key]
+
+# 外部接口函数，编译正则表达式为共享的规范最小DFA
+def compile(pattern: str) -> FSA:
+    key = _pattern_fingerprints.get(pattern)
+    if key is None:
+        dfa = dfa_minimizer.minimize(nfa_to_dfa.convert(regex.parse(pattern)))
+        key = fingerprint(dfa)
+        _pattern_fingerprints[pattern] = key
+        _registry.setdefault(key, canonicalize(dfa))
+    return _registry[key]
+
+# 外部接口函数，返回正则表达式的指纹
+def pattern_fingerprint(pattern: str) -> str:
+    compile(pattern)
+    return _pattern_fingerprints[pattern]
+
+# 外部接口函数，判断两个正则表达式是否等价，编译后只需比较一次指纹
+def equivalent(r1: str, r2: str) -> bool:
+    return pattern_fingerprint(r1) == pattern_fingerprint(r2)
+
+# 清空共享缓存
+def clear_cache():
+    _registry.clear()
+    _pattern_fingerprints.clear()
+
+# 主函数，用于从命令行判断两个正则表达式是否等价
+def main():
+    import sys
+    print(pattern_fingerprint(sys.argv[1]))
+    print(pattern_fingerprint(sys.argv[2]))
+    print('equivalent' if equivalent(sys.argv[1], sys.argv[2]) else 'different')
+
+if __name__ == '__main__':
+    main()
+
+"""
+最小DFA的规范形式（Canonical Form）
+同一个正则语言的最小DFA在同构意义下唯一，只是状态编号依赖于构造过程中集合的遍历顺序。
+给状态一个确定的编号后，等价的正则表达式就得到完全相同的DFA。
+
+具体实现
+
+规范编号：
+    从起始状态0出发广度优先遍历，每个状态的出边按标签排序，按首次访问的顺序重新编号。
+    无法到达终止状态的状态不属于最小DFA的语言结构，在编号时一并删除。
+
+稳定指纹：
+    将规范DFA序列化为（终止状态集编号，排序后的边）的列表，计算 SHA-256。
+    指纹不依赖进程的哈希随机化，可以作为内存或磁盘缓存的键。
+
+共享编译结果：
+    _registry 以指纹为键保存规范DFA，语法不同但等价的正则表达式共用同一个对象；
+    _pattern_fingerprints 记录正则表达式到指纹的映射，equivalent 在编译之后只比较一次指纹。
+"""
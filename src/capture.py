@@ -0,0 +1,105 @@
+from . import regex, nfa_to_dfa
+
+NOW = nfa_to_dfa._TaggedNFAToDFA.NOW
+
+# 捕获组匹配器类，沿TDFA做一次确定性的扫描，同时更新标签寄存器
+class _Matcher:
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        nfa = regex.parse(pattern, captures=True)
+        dfa, self.start_ops, self.final_regs = nfa_to_dfa.convert_tagged(nfa)
+        self.groups = sum(1 for state in nfa.states for edge in state.edges
+                          if edge.tag is not None and edge.tag % 2 == 0)
+        # table[state][val] = (dst, ops)
+        self.table = [dict((edge.val, (edge.dst, edge.tag)) for edge in state.edges)
+                      for state in dfa.states]
+
+    # 从pos开始做最长匹配，返回各组的(start, end)列表（第0组为整个匹配，未参与匹配的组为None）
+    def match(self, text: str, pos=0):
+        table = self.table
+        final_regs = self.final_regs
+        state = 0
+        regs = [pos] * len(self.start_ops)
+        best = self.spans(pos, pos, regs, final_regs[0]) if 0 in final_regs else None
+        for i in range(pos, len(text)):
+            transition = table[state].get(text[i])
+            if transition is None:
+                break
+            state, ops = transition
+            regs = [i + 1 if src == NOW else regs[src] for src in ops]
+            if state in final_regs:
+                best = self.spans(pos, i + 1, regs, final_regs[state])
+        return best
+
+    # 匹配整个text，不匹配时返回None
+    def fullmatch(self, text: str):
+        result = self.match(text)
+        if result is None or result[0][1] != len(text):
+            return None
+        return result
+
+    # 由终止状态的寄存器读出各组的位置
+    def spans(self, start, end, regs, tag_regs):
+        result = [(start, end)]
+        for group in range(self.groups):
+            begin_reg, end_reg = tag_regs[2 * group], tag_regs[2 * group + 1]
+            if begin_reg < 0 or end_reg < 0:
+                result.append(None)
+            else:
+                result.append((regs[begin_reg], regs[end_reg]))
+        return result
+
+# 外部接口函数，编译带捕获组的正则表达式
+def compile(pattern: str) -> _Matcher:
+    return _Matcher(pattern)
+
+# 外部接口函数，从pos开始匹配，返回各组的(start, end)列表或None
+def match(pattern, text: str, pos=0):
+    if isinstance(pattern, str):
+        pattern = _Matcher(pattern)
+    return pattern.match(text, pos)
+
+# 外部接口函数，匹配整个text，返回各组的(start, end)列表或None
+def fullmatch(pattern, text: str):
+    if isinstance(pattern, str):
+        pattern = _Matcher(pattern)
+    return pattern.fullmatch(text)
+
+# 外部接口函数，返回各组匹配到的字符串
+def groups(pattern, text: str):
+    spans = fullmatch(pattern, text)
+    if spans is None:
+        return None
+    return [None if span is None else text[span[0]:span[1]] for span in spans]
+
+# 主函数，用于从命令行提取捕获组
+def main():
+    import sys
+    print(groups(sys.argv[1], sys.argv[2]))
+
+if __name__ == '__main__':
+    main()
+
+"""
+捕获组（Capturing Groups）与带标签的DFA（Tagged DFA）
+regex.parse(pattern, captures=True) 用两条带标签的epsilon边包围每个括号：进入时经过标签2k，离开时经过标签2k+1。
+普通的子集构造把它们当作epsilon边，因此不影响已有的转换。
+
+TDFA构造（nfa_to_dfa._TaggedNFAToDFA）：
+    DFA状态是按优先级排列的(NFA状态, 每个标签所在的寄存器)列表。沿字符转移后按边的顺序计算闭包，
+    经过带标签的边时该标签的值改为“当前位置”；多条路径到达同一个NFA状态时只保留优先级最高的一条，
+    因此选择、重复的优先级与回溯引擎一致（左边的分支优先，重复尽量多）。
+    每个状态内的寄存器按首次出现的顺序重新编号，转移边上记录新寄存器的来源（旧寄存器或当前位置），
+    这样状态数有限，运行时每个字符只需按寄存器操作复制一次寄存器。
+
+匹配：
+    沿TDFA扫描一遍，每到一个终止状态就记录当前的匹配终点和各组的位置，最后得到最长匹配。
+    整个过程没有回溯，也不需要第二个正则引擎。
+
+与Python re的差异（重复体可以匹配空串时）：
+    计算闭包时每个NFA状态只经过一次（优先级最高的路径），因此一次消耗了字符的迭代之后，
+    不会再额外进行一次匹配空串的迭代：重复中的组保留最后一次非空迭代的位置，这与Laurikari的TDFA一致。
+    Python re 在这种情况下还会记录一次末尾的空迭代，例如 (a?)* 匹配 'aa' 时，
+    这里第1组为 (1, 2)，re 为 (2, 2)；b((bb)?)* 匹配 'bbb' 时，这里第1组为 (1, 3)，re 为 (3, 3)。
+    整个匹配的范围以及重复体不能匹配空串时各组的位置都与 re.fullmatch 相同。
+"""
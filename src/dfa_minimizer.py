@@ -1,47 +1,59 @@
 from .fsa import FSA
+from collections import defaultdict
 
 # 最小化DFA的类
 class _Minimizer:
-    # 最小化方法
-    def minimize(self, dfa: FSA, final_sets):
+    # 最小化方法，distinct中的状态已知两两不等价（例如增量编译时沿用的旧状态）
+    # 只需比较同一块中至少有一个状态不在distinct中的状态对，增量编译时的工作量与受影响的状态数成正比
+    def minimize(self, dfa: FSA, final_sets, distinct=()):
         self.dfa = dfa
         self.final_sets = final_sets
-        self.affect = [[list() for j in range(len(self.dfa.states))]
-                       for i in range(len(self.dfa.states))]
-        self.combinable = [[True] * len(self.dfa.states)
-                           for i in range(len(self.dfa.states))]
-        self.mark_uncombinable()  # 标记不可合并的状态对
+        self.distinct = set(distinct)
+        self.affect = defaultdict(list)  # affect[i, j]为依赖状态对(i, j)的状态对列表
+        self.uncombinable = set()  # 已标记为不可合并的状态对(i, j)，i < j
+        self.mark_uncombinable()  # 按终止状态集分块
         self.calculate_dependency()  # 计算依赖关系
         new_states, to_new_state = self.relabel()  # 重新标记状态
         return self.build_min_dfa(new_states, to_new_state)  # 构建最小化DFA
 
-    # 标记不可合并的状态对
+    # 按所属的终止状态集把状态分块，不同块中的状态不可合并，不需要逐对标记
+    # 同时属于多个终止状态集的状态与其他任何状态都不可合并，单独成块
     def mark_uncombinable(self):
-        final_states = set()
-        for final_set in self.final_sets:
-            final_states.update(final_set)
-        nonfinal_states = set(range(len(self.dfa.states))) - final_states
-        uncombinable_sets = list(self.final_sets)
-        uncombinable_sets.append(nonfinal_states)
-
-        for x in range(len(uncombinable_sets)):
-            x_set = uncombinable_sets[x]
-            for y in range(x + 1, len(uncombinable_sets)):
-                y_set = uncombinable_sets[y]
-                for x_elem in x_set:
-                    for y_elem in y_set:
-                        if x_elem > y_elem:
-                            self.combinable[y_elem][x_elem] = False
-                        else:
-                            self.combinable[x_elem][y_elem] = False
+        keys = dict()
+        self.block = list()
+        for state in range(len(self.dfa.states)):
+            owners = [index for index, final_set in enumerate(self.final_sets)
+                      if state in final_set]
+            key = owners[0] if len(owners) == 1 else (-1 if not owners else ('own', state))
+            self.block.append(keys.setdefault(key, len(keys)))
+        self.blocks = [list() for i in range(len(keys))]
+        for state, block in enumerate(self.block):
+            self.blocks[block].append(state)
+
+    # 判断状态对(i, j)是否仍可能合并，i < j
+    def combinable(self, i, j):
+        return (self.block[i] == self.block[j] and
+                not (i in self.distinct and j in self.distinct) and
+                (i, j) not in self.uncombinable)
+
+    # 同一块中需要比较的状态对：distinct中的状态之间不需要比较
+    def candidate_pairs(self, states):
+        affected = [state for state in states if state not in self.distinct]
+        for x in range(len(affected)):
+            for y in range(x + 1, len(affected)):
+                yield affected[x], affected[y]
+        for state in states:
+            if state in self.distinct:
+                for other in affected:
+                    yield (state, other) if state < other else (other, state)
 
     # 标记状态对为不可合并
     def mark(self, i, j):
-        if self.combinable[i][j] is False:
+        if (i, j) in self.uncombinable:
             return
 
-        self.combinable[i][j] = False
-        for x, y in self.affect[i][j]:
+        self.uncombinable.add((i, j))
+        for x, y in self.affect.pop((i, j), ()):
             self.mark(x, y)
 
     # 处理状态对，检查其依赖关系
@@ -60,39 +72,39 @@ class _Minimizer:
                 continue
             if x_dst > y_dst:
                 x_dst, y_dst = y_dst, x_dst
-            if self.combinable[x_dst][y_dst]:
+            if self.combinable(x_dst, y_dst):
                 dependency.append((x_dst, y_dst))
             else:
                 self.mark(x, y)
                 return
 
         for x_dst, y_dst in dependency:
-            self.affect[x_dst][y_dst].append((x, y))
+            self.affect[x_dst, y_dst].append((x, y))
 
     # 计算依赖关系
     def calculate_dependency(self):
-        for i in range(len(self.dfa.states)):
-            for j in range(i + 1, len(self.dfa.states)):
-                self.process_state(i, j)
+        for states in self.blocks:
+            for i, j in self.candidate_pairs(states):
+                # 已经确定不可合并的状态对不需要再记录依赖关系
+                if self.combinable(i, j):
+                    self.process_state(i, j)
 
-    # 重新标记状态
+    # 重新标记状态：可合并关系是等价关系，每个状态归入与它可合并的编号最小的状态所在的新状态
     def relabel(self):
-        processed = [False] * len(self.dfa.states)
+        representative = list(range(len(self.dfa.states)))
+        for states in self.blocks:
+            for i, j in self.candidate_pairs(states):
+                if self.combinable(i, j) and i < representative[j]:
+                    representative[j] = i
         to_new_state = [-1] * len(self.dfa.states)
         new_states = list()
         for i in range(len(self.dfa.states)):
-            if processed[i]:
-                continue
-            processed[i] = True
-            new_states.append({i})
-            to_new_state[i] = len(new_states) - 1
-            for j in range(i + 1, len(self.dfa.states)):
-                if processed[j]:
-                    continue
-                if self.combinable[i][j]:
-                    processed[j] = True
-                    new_states[-1].add(j)
-                    to_new_state[j] = len(new_states) - 1
+            if representative[i] == i:
+                new_states.append({i})
+                to_new_state[i] = len(new_states) - 1
+            else:
+                to_new_state[i] = to_new_state[representative[i]]
+                new_states[to_new_state[i]].add(i)
         return new_states, to_new_state
 
     # 构建最小化的DFA
@@ -115,35 +127,34 @@ class _Minimizer:
         return dfa, new_final_sets
 
 # 最小化DFA的外部接口函数
-def minimize(dfa: FSA, final_sets=None):
+def minimize(dfa: FSA, final_sets=None, distinct=()):
     if final_sets is None:
-        return _Minimizer().minimize(dfa, (set(dfa.finals),))[0]
-    return _Minimizer().minimize(dfa, final_sets)
+        return _Minimizer().minimize(dfa, (set(dfa.finals),), distinct)[0]
+    return _Minimizer().minimize(dfa, final_sets, distinct)
 
 # 主函数，用于从命令行解析正则表达式并进行NFA到DFA的转换和最小化
 def main():
     import sys
-    import regex
-    import nfa_to_dfa
-    from utils import get_dot_file_path
+    from . import regex, nfa_to_dfa
+    from .utils import get_dot_file_path, dump
 
     # 从命令行参数解析正则表达式
     nfa = regex.parse(sys.argv[1])
     # 将NFA保存为DOT文件
     nfa_dot_path = get_dot_file_path('nfa.dot')
-    nfa.dump(open(nfa_dot_path, 'w'))
+    dump(nfa, nfa_dot_path)
 
     # 将NFA转换为DFA
     dfa = nfa_to_dfa.convert(nfa)
     # 将DFA保存为DOT文件
     dfa_dot_path = get_dot_file_path('dfa.dot')
-    dfa.dump(open(dfa_dot_path, 'w'))
+    dump(dfa, dfa_dot_path)
 
     # 最小化DFA
     mindfa = minimize(dfa)
     # 将最小化DFA保存为DOT文件
     mindfa_dot_path = get_dot_file_path('mindfa.dot')
-    mindfa.dump(open(mindfa_dot_path, 'w'))
+    dump(mindfa, mindfa_dot_path)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,43 @@
+import importlib
+
+# 由正则表达式构建NFA的方法：(模块名, 函数名)。Thompson NFA含epsilon边，位置自动机不含epsilon边
+NFA_BUILDERS = {
+    'thompson': ('regex', 'parse'),
+    'position': ('position', 'parse'),
+}
+
+# 由正则表达式直接构建（未最小化的）DFA的方法，None表示先构建NFA再做子集构造
+DFA_BUILDERS = {
+    'thompson': None,
+    'position': ('position', 'convert'),
+}
+
+ENGINES = tuple(NFA_BUILDERS)
+
+DEFAULT_ENGINE = 'thompson'
+
+# 按需导入引擎所在的子模块，返回其中的函数
+def _load(builder):
+    module_name, function_name = builder
+    return getattr(importlib.import_module('.' + module_name, __package__), function_name)
+
+# 检查引擎名
+def _check(engine):
+    if engine not in NFA_BUILDERS:
+        raise ValueError('Unknown engine %r, expected one of %s' % (engine, ', '.join(ENGINES)))
+
+# 外部接口函数，用指定的引擎构建NFA
+def to_nfa(pattern: str, engine=DEFAULT_ENGINE):
+    _check(engine)
+    return _load(NFA_BUILDERS[engine])(pattern)
+
+# 外部接口函数，用指定的引擎构建DFA，minimize为True时返回最小DFA
+def to_dfa(pattern: str, engine=DEFAULT_ENGINE, minimize=True):
+    _check(engine)
+    if DFA_BUILDERS[engine] is None:
+        dfa = _load(('nfa_to_dfa', 'convert'))(to_nfa(pattern, engine))
+    else:
+        dfa = _load(DFA_BUILDERS[engine])(pattern)
+    if minimize:
+        dfa = _load(('dfa_minimizer', 'minimize'))(dfa)
+    return dfa
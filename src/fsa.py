@@ -2,9 +2,10 @@ from copy import deepcopy
 
 # 边类，表示从一个状态到另一个状态的转换
 class Edge:
-    def __init__(self, dst, val):
+    def __init__(self, dst, val, tag=None):
         self.val = val  # 边的值
         self.dst = dst  # 目标状态
+        self.tag = tag  # 标签：NFA中为epsilon边记录的标签编号，TDFA中为寄存器操作
 
 # 状态类，表示有限状态自动机中的一个状态
 class State:
@@ -33,13 +34,17 @@ class FSA:
         return state
 
     # 添加一条边，从src状态到dst状态，边的值为val
-    def add_edge(self, src, dst, val):
-        self.states[src].edges.append(Edge(dst, val))
+    def add_edge(self, src, dst, val, tag=None):
+        self.states[src].edges.append(Edge(dst, val, tag))
 
     # 添加一条epsilon边（值为0），从src状态到dst状态
     def add_edge_epsilon(self, src, dst):
         self.add_edge(src, dst, 0)
 
+    # 添加一条带标签的epsilon边，经过时记录当前位置到标签tag
+    def add_edge_tag(self, src, dst, tag):
+        self.add_edge(src, dst, 0, tag)
+
     # 合并另一个FSA到当前FSA，返回偏移量
     def combine(self, fsa) -> int:
         offset = len(self.states)  # 当前状态数量作为偏移量
@@ -57,6 +62,21 @@ class FSA:
     def duplicate(self):
         return deepcopy(self)
 
+    # 返回能够到达终止状态的状态索引集合
+    def live_states(self):
+        preds = [list() for i in range(len(self.states))]
+        for src, state in enumerate(self.states):
+            for edge in state.edges:
+                preds[edge.dst].append(src)
+        live = set(self.finals)
+        work = list(live)
+        while work:
+            for src in preds[work.pop()]:
+                if src not in live:
+                    live.add(src)
+                    work.append(src)
+        return live
+
     # # 将FSA的结构输出到文件，格式为Graphviz的dot文件
     # def dump(self, f):
     #     f.write('digraph {\n')
@@ -72,6 +92,6 @@ class FSA:
 
     # 从正则表达式构建FSA
     def from_regex(regex: str):
-        from regex import parse  # 导入正则表达式解析模块
-        from nfa_to_dfa import convert  # 导入NFA到DFA的转换模块
+        from .regex import parse  # 导入正则表达式解析模块
+        from .nfa_to_dfa import convert  # 导入NFA到DFA的转换模块
         return convert(parse(regex))  # 解析正则表达式并转换为FSA
@@ -0,0 +1,358 @@
+import codecs
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from .fsa import FSA
+from . import regex, nfa_to_dfa, dfa_minimizer, canonical
+
+# 词法单元：kind为规则名，text为匹配到的文本，pos为在输入中的起始位置
+Token = namedtuple('Token', ['kind', 'text', 'pos'])
+
+# 词法分析器类，按优先级合并所有规则并编译为一个最小DFA
+class Lexer:
+    # rules为(kind, pattern)列表，靠前的规则优先级更高
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.build()
+
+    # 编译所有规则，保留子集构造的中间结果以便增量修改规则
+    def build(self):
+        nfa = FSA()
+        self.ranges = list()  # 每条规则在合并后NFA中的状态区间[lo, hi)和终止状态
+        for kind, pattern in self.rules:
+            lo = nfa.combine(regex.parse(pattern))
+            nfa.add_edge_epsilon(0, lo)
+            self.ranges.append((lo, len(nfa.states), nfa.finals[-1]))
+        self.converter = nfa_to_dfa.IncrementalNFAToDFA()
+        self.converter.build(nfa)
+        self.rebuild_dfa()
+
+    # 由集合图重新生成DFA，最小化并规范化，结果与从头编译完全相同
+    def rebuild_dfa(self):
+        final_sets = [{final} for lo, hi, final in self.ranges]
+        dfa, final_sets, distinct = self.converter.to_dfa(final_sets)
+        dfa, final_sets = dfa_minimizer.minimize(dfa, final_sets, distinct)
+        dfa, final_sets = canonical.canonicalize(dfa, final_sets)
+        self.converter.record_classes(dfa)
+        self.load(dfa, final_sets)
+
+    # 增加一条规则，index为插入位置（决定优先级），默认优先级最低
+    def add_rule(self, kind, pattern, index=None):
+        if index is None:
+            index = len(self.rules)
+        fsa = regex.parse(pattern)
+        self.rules.insert(index, (kind, pattern))
+        lo, hi = self.converter.add_branch(fsa)
+        self.ranges.insert(index, (lo, hi, lo + fsa.finals[0]))
+        self.rebuild_dfa()
+
+    # 删除名为kind的规则
+    def remove_rule(self, kind):
+        index = [rule[0] for rule in self.rules].index(kind)
+        lo, hi, final = self.ranges[index]
+        self.converter.remove_branch(lo, hi)
+        del self.rules[index]
+        del self.ranges[index]
+        size = hi - lo
+        self.ranges = [rng if rng[0] < lo else tuple(i - size for i in rng)
+                       for rng in self.ranges]
+        self.rebuild_dfa()
+
+    # 将DFA展开为转移表和接受向量
+    def load(self, dfa: FSA, final_sets):
+        self.dfa = dfa
+        self.final_sets = final_sets
+        self.kinds = [rule[0] for rule in self.rules]
+        self.table = [dict((edge.val, edge.dst) for edge in state.edges)
+                      for state in dfa.states]
+        # accept[state]为该状态接受的规则编号，不接受时为-1
+        self.accept = [-1] * len(dfa.states)
+        for rule_index in range(len(final_sets) - 1, -1, -1):
+            for state in final_sets[rule_index]:
+                self.accept[state] = rule_index
+
+    # 对完整的字符串进行词法分析
+    def tokenize(self, text: str):
+        scanner = _Scanner(self)
+        yield from scanner.feed(text)
+        yield from scanner.finish()
+
+    # 对完整的字符串进行词法分析，返回依次存放每个词法单元的规则编号、起点、终点的int数组，不构造Token
+    def spans(self, text: str):
+        spans = array('q')
+        pos = 0
+        while pos < len(text):
+            rule, end = _longest_match(self.table, self.accept, text, pos, True)
+            if rule < 0:
+                raise SyntaxError('Unexpected character %r at position %d' % (text[pos], pos))
+            spans.extend((rule, pos, end))
+            pos = end
+        return spans
+
+    # 把spans数组按批转换为Token，只在消费者取用时才构造
+    def materialize(self, text: str, spans, batch=1 << 16):
+        kinds = self.kinds
+        for lo in range(0, len(spans), 3 * batch):
+            chunk = spans[lo:lo + 3 * batch]
+            begins = chunk[1::3]
+            yield from map(Token, map(kinds.__getitem__, chunk[0::3]),
+                           map(text.__getitem__, map(slice, begins, chunk[2::3])), begins)
+
+    # 把输入分块后在进程池中推测扫描，返回与spans完全相同的数组
+    def spans_parallel(self, text: str, workers=None, chunk_size=1 << 20, overlap=4096):
+        workers = workers or os.cpu_count() or 1
+        if workers < 2 or len(text) < 2 * chunk_size:
+            return self.spans(text)
+        from concurrent.futures import ProcessPoolExecutor
+        bounds = list(range(0, len(text), chunk_size)) + [len(text)]
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(self.table, self.accept)) as executor:
+            futures = list()
+            for start, stop in zip(bounds, bounds[1:]):
+                limit = min(len(text), stop + overlap)
+                futures.append(executor.submit(_lex_chunk, text[start:limit], start,
+                                               stop - start, limit == len(text)))
+            results = [future.result() for future in futures]
+        return self.stitch(text, bounds, results)
+
+    # 并行词法分析，结果与tokenize完全相同；扫描在调用时完成，Token在迭代时才逐批构造
+    def tokenize_parallel(self, text: str, workers=None, chunk_size=1 << 20, overlap=4096):
+        return self.materialize(text, self.spans_parallel(text, workers, chunk_size, overlap))
+
+    # 按顺序拼接各块的推测结果：真实的词法单元边界落在某条推测链上时，整段复制该链之后的全部推测结果，
+    # 否则从该位置顺序扫描一个词法单元
+    def stitch(self, text, bounds, results):
+        spans = array('q')
+        pos = 0
+        for stop, (spec, runs) in zip(bounds[1:], results):
+            while pos < stop:
+                index = _find_start(spec, runs, pos)
+                if index is None:
+                    rule, end = _longest_match(self.table, self.accept, text, pos, True)
+                    if rule < 0:
+                        raise SyntaxError('Unexpected character %r at position %d'
+                                          % (text[pos], pos))
+                    spans.extend((rule, pos, end))
+                    pos = end
+                    continue
+                run = bisect_right(runs, index)
+                run_end = runs[run] if run < len(runs) else len(spec) // 3
+                spans += spec[3 * index:3 * run_end]
+                pos = spec[3 * run_end - 1]
+        return spans
+
+# 扫描器类，保存跨输入块的扫描状态，支持逐块输入
+# 只用到lexer的table、accept和kinds，因此也可以扫描其他形式的编译结果
+class _Scanner:
+    def __init__(self, lexer: Lexer):
+        self.lexer = lexer
+        self.buffer = ''  # 尚未输出的文本
+        self.offset = 0  # buffer[0]在整个输入中的位置
+        self.reset()
+
+    # 从buffer开头重新开始扫描一个词法单元
+    def reset(self):
+        self.state = 0
+        self.scan = 0  # 已扫描到的buffer位置
+        self.last_end = 0  # 最近一次接受的结束位置
+        self.last_rule = -1  # 最近一次接受的规则编号
+
+    # 输入一块文本，返回其中已经能够确定的词法单元
+    def feed(self, text: str):
+        self.buffer += text
+        return self.run(False)
+
+    # 输入结束，返回剩余的词法单元
+    def finish(self):
+        return self.run(True)
+
+    # 最长匹配扫描；eof为False时，扫描到buffer末尾就等待更多输入
+    def run(self, eof):
+        table = self.lexer.table
+        accept = self.lexer.accept
+        buffer = self.buffer
+        tokens = list()
+        start = 0
+        while True:
+            state = self.state
+            scan = self.scan
+            while scan < len(buffer):
+                state = table[state].get(buffer[scan])
+                if state is None:
+                    break
+                scan += 1
+                if accept[state] >= 0:
+                    self.last_end = scan
+                    self.last_rule = accept[state]
+            else:
+                if not eof or start == len(buffer):
+                    self.state = state
+                    self.scan = scan
+                    break
+            # 当前词法单元已确定，输出最长匹配
+            if self.last_rule < 0:
+                raise SyntaxError('Unexpected character %r at position %d'
+                                  % (buffer[start], self.offset + start))
+            end = self.last_end
+            kind = self.lexer.kinds[self.last_rule]
+            tokens.append(Token(kind, buffer[start:end], self.offset + start))
+            start = end
+            self.reset()
+            self.scan = self.last_end = start
+        self.buffer = buffer[start:]
+        self.offset += start
+        self.scan -= start
+        self.last_end -= start
+        return tokens
+
+# 从pos开始、以state为当前状态做一次最长匹配，返回(规则编号, 结束位置)，没有匹配时规则编号为-1
+# complete为False表示text之后还有内容，扫描到末尾仍未结束时无法确定结果，返回None
+def _longest_match(table, accept, text, pos, complete, state=0):
+    last_rule, last_end = -1, pos
+    scan = pos
+    while scan < len(text):
+        state = table[state].get(text[scan])
+        if state is None:
+            break
+        scan += 1
+        if accept[state] >= 0:
+            last_rule, last_end = accept[state], scan
+    else:
+        if not complete:
+            return None
+    return last_rule, last_end
+
+# 在推测结果中查找起点为pos的词法单元，返回其下标，不存在时返回None
+# 每条推测链内的起点是递增的，因此在每条链上二分查找
+def _find_start(spec, runs, pos):
+    bounds = list(runs) + [len(spec) // 3]
+    for lo, hi in zip(bounds, bounds[1:]):
+        index = bisect_left(range(lo, hi), pos, key=lambda i: spec[3 * i + 1]) + lo
+        if index < hi and spec[3 * index + 1] == pos:
+            return index
+    return None
+
+# 进程池中的转移表和接受向量，每个工作进程只接收一次
+_worker_tables = None
+
+def _init_worker(table, accept):
+    global _worker_tables
+    _worker_tables = (table, accept)
+
+# 推测扫描一块文本。块的开头可能落在某个词法单元的中间，此时扫描器的真实状态（入口状态）未知：
+# 对每个可能的入口状态，先求出它所在的词法单元在块中的终点，再从块开头和这些终点出发分别扫描起点在[0, stop)内的词法单元。
+# 各条推测链遇到已经扫描过的起点即汇合，之后的结果完全相同，不再重复扫描。
+# 返回依次存放每个词法单元的规则编号、起点、终点（加上offset后为在整个输入中的位置）的int数组，
+# 以及各条链的第一个词法单元的下标；需要块之后的文本才能确定的词法单元不会出现在结果中
+def _lex_chunk(text, offset, stop, complete):
+    table, accept = _worker_tables
+    entries = {0}
+    for state in range(1, len(table)):
+        match = _longest_match(table, accept, text, 0, complete, state)
+        if match is not None and match[0] >= 0:
+            entries.add(match[1])
+    tokens = array('q')
+    runs = list()
+    seen = set()  # 已经扫描过的起点
+    for pos in sorted(entries):
+        if pos >= stop or pos in seen:
+            continue
+        runs.append(len(tokens) // 3)
+        while pos < stop and pos not in seen:
+            match = _longest_match(table, accept, text, pos, complete)
+            if match is None or match[0] < 0:
+                break
+            seen.add(pos)
+            tokens.extend((match[0], pos + offset, match[1] + offset))
+            pos = match[1]
+        if runs[-1] == len(tokens) // 3:
+            runs.pop()
+    return tokens, runs
+
+# 外部接口函数，编译词法规则
+def compile(rules) -> Lexer:
+    return Lexer(rules)
+
+# 外部接口函数，对字符串进行词法分析
+def tokenize(text: str, rules):
+    if not isinstance(rules, Lexer):
+        rules = Lexer(rules)
+    return rules.tokenize(text)
+
+# 外部接口函数，在多个进程中并行进行词法分析，返回按批构造Token的迭代器
+def tokenize_parallel(text: str, rules, workers=None, chunk_size=1 << 20, overlap=4096):
+    if not isinstance(rules, Lexer):
+        rules = Lexer(rules)
+    return rules.tokenize_parallel(text, workers, chunk_size, overlap)
+
+# 外部接口函数，从asyncio.StreamReader中异步读取并进行词法分析
+# 每次只读取并处理一块数据，消费者取完这一块的词法单元后才会读取下一块
+async def atokenize(reader, rules, chunk_size=65536, encoding='utf-8'):
+    import asyncio
+    if not isinstance(rules, Lexer):
+        rules = Lexer(rules)
+    scanner = _Scanner(rules)
+    decoder = codecs.getincrementaldecoder(encoding)()
+    while True:
+        data = await reader.read(chunk_size)
+        if not data:
+            break
+        for token in scanner.feed(decoder.decode(data)):
+            yield token
+        # reader中已有缓冲数据时read不会让出事件循环，这里主动让出
+        await asyncio.sleep(0)
+    for token in scanner.feed(decoder.decode(b'', final=True)):
+        yield token
+    for token in scanner.finish():
+        yield token
+
+# 主函数，用于从命令行对文件进行词法分析，规则形如 kind=pattern
+def main():
+    import sys
+    rules = [arg.split('=', 1) for arg in sys.argv[2:]]
+    with open(sys.argv[1]) as file:
+        for token in tokenize(file.read(), rules):
+            print(token.pos, token.kind, repr(token.text))
+
+if __name__ == '__main__':
+    main()
+
+"""
+词法分析（Lexical Analysis）
+把多条规则的NFA用epsilon边并联到同一个起始状态，每条规则的终止状态作为一个终止状态集，
+nfa_to_dfa.convert 按规则顺序给DFA状态标注优先级最高的规则，再由 dfa_minimizer.minimize 最小化。
+
+最长匹配（Maximal Munch）：
+    从词法单元的起点开始沿DFA前进，记录最近一次经过接受状态的位置和规则；
+    DFA无法继续前进时，输出最近一次接受的词法单元，并从其结束位置重新开始。
+
+逐块扫描：
+    _Scanner 保存DFA状态、已扫描位置和最近一次接受的位置。
+    输入块在词法单元中间结束时，扫描器保留未完成的文本，下一块到来后从原来的状态继续，不会重新扫描。
+
+增量修改规则：
+    Lexer 保留合并后的NFA、闭包数组和子集构造得到的集合图。增加规则时，新规则的NFA并联到起始状态，
+    新的DFA状态都是“原集合 ∪ 新规则状态集合”，原集合部分的转移直接取自原集合图，只对新规则的状态调用 get_dst_sets；
+    删除规则时，各规则的NFA互不相连，把集合图中的每个集合投影掉该规则的状态即可。
+    未受影响的集合的后继也未受影响，它们在上一次最小化中的等价类仍然成立且两两不等价：
+    生成DFA时同一等价类的集合直接合并，最小化时跳过这些状态之间的比较，只比较受影响的状态。
+    最后规范化，因此结果与从头编译完全相同，而不需要对所有规则重新做子集构造和最小化。
+
+并行扫描：
+    把输入切成若干块，每块在进程池中推测扫描（每块多读 overlap 个字符用于最长匹配的前瞻）。
+    块的开头可能落在某个词法单元中间，扫描器此时的DFA状态（入口状态）只有扫描完前面的块才知道。
+    工作进程对每个可能的入口状态求出该词法单元在块中的终点，再从块开头以及这些终点出发，各自从起始状态扫描出一条推测链；
+    从同一个位置开始的最长匹配只取决于之后的文本，因此各条链一旦经过同一个起点就汇合，之后只扫描一次。
+    拼接时按顺序确定真实的边界：真实的入口状态必然是候选之一，它对应的终点就是某条链的起点，
+    从这里开始沿用该链以及与它汇合的链上的全部结果。只有推测需要块之后更多文本的少数位置，才在主进程中顺序扫描。
+    工作进程返回的是 (规则编号, 起点, 终点) 的紧凑int数组，位置已经换算为整个输入中的位置，
+    拼接只是按链整段复制数组，主进程的工作量与块数而不是词法单元数成正比。
+    构造 Token 是逐个进行的Python对象分配，放在主进程中会抵消并行扫描的收益：
+    spans_parallel 直接返回数组，需要规则编号和位置的调用者不构造任何 Token；
+    tokenize_parallel 返回的迭代器在消费者取用时才按批构造 Token。bench_lexer.py 给出各部分的耗时。
+
+异步接口：
+    atokenize 是异步生成器，每次从 StreamReader 读取一块数据并处理，事件循环每次最多被占用一块数据的时间。
+    消费者不取走词法单元时不会继续读取，StreamReader 的缓冲区满后自动暂停底层传输，形成背压。
+"""
@@ -0,0 +1,165 @@
+import time
+from collections import namedtuple
+from .fsa import FSA
+from .nfa_to_dfa import _NFAToDFA
+
+# 单个优化步骤的统计信息
+PassStats = namedtuple('PassStats', ['name', 'states_before', 'states_after',
+                                     'edges_before', 'edges_after', 'seconds'])
+
+# 统计FSA中边的数量
+def count_edges(nfa: FSA) -> int:
+    return sum(len(state.edges) for state in nfa.states)
+
+# 按to_new_state重新编号构建FSA，to_new_state[old]为-1表示删除该状态，重复的边只保留一条
+def _rebuild(nfa: FSA, final_sets, to_new_state):
+    result = FSA()
+    for i in range(max(to_new_state)):
+        result.add_state()
+    seen = set()
+    for old, state in enumerate(nfa.states):
+        src = to_new_state[old]
+        if src < 0:
+            continue
+        for edge in state.edges:
+            dst = to_new_state[edge.dst]
+            if dst >= 0 and (src, dst, edge.val) not in seen:
+                seen.add((src, dst, edge.val))
+                result.add_edge(src, dst, edge.val)
+    new_final_sets = [set(to_new_state[s] for s in final_set if to_new_state[s] >= 0)
+                      for final_set in final_sets]
+    result.finals = sorted(set().union(*new_final_sets))
+    return result, new_final_sets
+
+# 消除epsilon边：每个状态直接拥有其闭包中所有状态的字符边，闭包中含终止状态的状态也成为终止状态
+def remove_epsilon(nfa: FSA, final_sets):
+    converter = _NFAToDFA()
+    converter.nfa = nfa
+    closures = converter.init_closure()
+    result = FSA()
+    for i in range(len(nfa.states) - 1):
+        result.add_state()
+    for src, closure in enumerate(closures):
+        seen = set()
+        for state in sorted(closure):
+            for edge in nfa.states[state].edges:
+                if edge.val != 0 and (edge.dst, edge.val) not in seen:
+                    seen.add((edge.dst, edge.val))
+                    result.add_edge(src, edge.dst, edge.val)
+    new_final_sets = [set(src for src, closure in enumerate(closures)
+                          if closure & final_set) for final_set in final_sets]
+    result.finals = sorted(set().union(*new_final_sets))
+    return result, new_final_sets
+
+# 删除从起始状态不可达或无法到达终止状态的状态，起始状态0总是保留
+def trim(nfa: FSA, final_sets):
+    reachable = {0}
+    work = [0]
+    while work:
+        for edge in nfa.states[work.pop()].edges:
+            if edge.dst not in reachable:
+                reachable.add(edge.dst)
+                work.append(edge.dst)
+    keep = reachable & nfa.live_states() | {0}
+    to_new_state = [-1] * len(nfa.states)
+    for new, old in enumerate(sorted(keep)):
+        to_new_state[old] = new
+    return _rebuild(nfa, final_sets, to_new_state)
+
+# 合并等价状态：反复按（所属终止状态集，各条边的标签和目标等价类）细分，直到不再变化
+# 互模拟的状态接受相同的语言，合并后语言不变
+def merge_equivalent(nfa: FSA, final_sets):
+    classes = [tuple(state in final_set for final_set in final_sets)
+               for state in range(len(nfa.states))]
+    count = 0
+    while True:
+        signatures = dict()
+        new_classes = list()
+        for state_index, state in enumerate(nfa.states):
+            signature = (classes[state_index],
+                         frozenset((edge.val, classes[edge.dst]) for edge in state.edges))
+            new_classes.append(signatures.setdefault(signature, len(signatures)))
+        classes = new_classes
+        if len(signatures) == count:
+            break
+        count = len(signatures)
+    # 每个等价类用其中编号最小的状态代表，保证起始状态仍为0
+    representative = dict()
+    for state_index, cls in enumerate(classes):
+        representative.setdefault(cls, len(representative))
+    to_new_state = [representative[cls] for cls in classes]
+    return _rebuild(nfa, final_sets, to_new_state)
+
+# 可用的优化步骤
+PASSES = {
+    'remove_epsilon': remove_epsilon,
+    'trim': trim,
+    'merge_equivalent': merge_equivalent,
+}
+
+DEFAULT_PASSES = ('remove_epsilon', 'trim', 'merge_equivalent')
+
+# 优化步骤管理器，依次执行各个步骤并记录每一步的效果
+class PassManager:
+    # passes为步骤名或函数的列表，函数签名为 (nfa, final_sets) -> (nfa, final_sets)
+    def __init__(self, passes=DEFAULT_PASSES):
+        self.passes = [(name, PASSES[name]) if isinstance(name, str)
+                       else (name.__name__, name) for name in passes]
+        self.report = list()
+
+    # 依次执行所有步骤
+    def run(self, nfa: FSA, final_sets):
+        self.report = list()
+        for name, function in self.passes:
+            states_before = len(nfa.states)
+            edges_before = count_edges(nfa)
+            begin = time.perf_counter()
+            nfa, final_sets = function(nfa, final_sets)
+            seconds = time.perf_counter() - begin
+            self.report.append(PassStats(name, states_before, len(nfa.states),
+                                         edges_before, count_edges(nfa), seconds))
+        return nfa, final_sets
+
+    # 将统计信息格式化为表格
+    def format_report(self) -> str:
+        lines = ['%-18s %15s %15s %10s' % ('pass', 'states', 'edges', 'ms')]
+        for stats in self.report:
+            lines.append('%-18s %6d -> %-6d %6d -> %-6d %10.3f' % (
+                stats.name, stats.states_before, stats.states_after,
+                stats.edges_before, stats.edges_after, stats.seconds * 1000))
+        return '\n'.join(lines)
+
+# 外部接口函数，在子集构造之前优化NFA
+def optimize(nfa: FSA, final_sets=None, passes=DEFAULT_PASSES):
+    manager = PassManager(passes)
+    if final_sets is None:
+        return manager.run(nfa, (set(nfa.finals),))[0]
+    return manager.run(nfa, final_sets)
+
+# 主函数，用于从命令行查看每个优化步骤的效果
+def main():
+    import sys
+    from .regex import parse
+    nfa = parse(sys.argv[1])
+    manager = PassManager()
+    manager.run(nfa, (set(nfa.finals),))
+    print(manager.format_report())
+
+if __name__ == '__main__':
+    main()
+
+"""
+NFA优化步骤（NFA Passes）
+Thompson 构造为每一层 parse_regexp 增加新的起始状态和终止状态，产生大量只起连接作用的状态和 epsilon 边，
+它们都会增加 init_closure 和 nfa_to_dfa_set_graph 的工作量。在 regex.parse 和 nfa_to_dfa.convert 之间
+执行一系列保持语义的变换，可以在子集构造之前缩小NFA。
+
+各个步骤：
+    remove_epsilon：计算每个状态的 epsilon 闭包，让状态直接拥有闭包中所有状态的字符边；
+        闭包中含有某个终止状态集的状态，也加入该终止状态集。之后只由 epsilon 边到达的状态变为不可达。
+    trim：删除从起始状态不可达、或者无法到达任何终止状态的状态。
+    merge_equivalent：按（所属终止状态集，出边标签和目标等价类）反复细分，合并互模拟的状态。
+
+所有步骤都保持状态0为起始状态，并同步更新各个终止状态集，因此可以直接用于按优先级区分规则的词法分析器。
+PassManager 记录每个步骤前后的状态数、边数和耗时，用于比较各个步骤的收益。
+"""
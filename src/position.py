@@ -0,0 +1,219 @@
+from collections import deque
+from .fsa import FSA
+from .regex import _Parser
+
+# 语法树结点：('leaf', 位置编号) | ('cat', [子结点]) | ('alt', [子结点]) | ('star'|'plus'|'opt', 子结点)
+# ('alt', []) 不匹配任何字符串
+
+# 语法树解析器类，文法与regex._Parser相同，但构建语法树而不是Thompson NFA
+class _TreeParser(_Parser):
+    # 解析正则表达式，返回语法树和每个位置可以匹配的字符集合
+    def parse(self, regex: str):
+        self.chars = list()  # chars[p]为位置p可以匹配的字符集合
+        return super().parse(regex), self.chars
+
+    # 新建一个位置
+    def leaf(self, chars):
+        self.chars.append(chars)
+        return ('leaf', len(self.chars) - 1)
+
+    # 解析字符范围 [a-z]
+    def parse_range(self):
+        if self.regex[self.pos] != '[':
+            return None
+        self.pos += 1
+
+        chars = set()
+        while self.pos < self.maxpos:
+            if self.peek() == ']':
+                self.pos += 1
+                return self.leaf(chars)
+            char = self.parse_char()
+            if self.peek() == '-':  # 处理字符范围
+                self.parse_char()
+                next_char = self.parse_char()
+                if ord(next_char) >= ord(char):
+                    chars.update(chr(i) for i in range(ord(char), ord(next_char) + 1))
+            else:
+                chars.add(char)
+        raise SyntaxError("Missing ]")
+
+    # 解析简单表达式
+    def parse_simple(self):
+        if self.peek() == '(':
+            self.pos += 1
+            if self.peek() == ')':
+                self.pos += 1
+            else:
+                node = self.parse_regexp()
+                if self.peek() != ')':
+                    raise SyntaxError("Missing )")
+                self.pos += 1
+                return node
+
+        node = self.parse_range()
+        if node:
+            return node
+        return self.leaf({self.parse_char()})
+
+    # 解析重复表达式
+    def parse_repeating(self):
+        node = self.parse_simple()
+        op = {'*': 'star', '+': 'plus', '?': 'opt'}.get(self.peek())
+        if op:
+            self.pos += 1
+            return (op, node)
+        return node
+
+    # 解析序列
+    def parse_sequence(self):
+        nodes = list()
+        while self.pos < self.maxpos:
+            if self.peek() in '|)':
+                break
+            nodes.append(self.parse_repeating())
+        if not nodes:
+            return None
+        return nodes[0] if len(nodes) == 1 else ('cat', nodes)
+
+    # 解析正则表达式
+    def parse_regexp(self):
+        nodes = list()
+        while self.pos < self.maxpos:
+            node = self.parse_sequence()
+            if node is None:
+                continue
+            nodes.append(node)
+
+            if self.peek() == '|':
+                self.pos += 1
+                continue
+            if (self.peek() == chr(0) or
+                self.peek() in self.FORBIDDEN_CHAR):
+                break
+        return nodes[0] if len(nodes) == 1 else ('alt', nodes)
+
+# 位置自动机类，计算nullable/firstpos/lastpos/followpos
+class _PositionAutomaton:
+    def build(self, regex: str):
+        tree, self.chars = _TreeParser().parse(regex)
+        self.follow = [set() for i in range(len(self.chars))]
+        self.nullable, self.first, self.last = self.visit(tree)
+        return self
+
+    # 后序遍历语法树，返回(nullable, firstpos, lastpos)，同时填写followpos
+    def visit(self, node):
+        kind = node[0]
+        if kind == 'leaf':
+            return False, {node[1]}, {node[1]}
+        if kind == 'alt':
+            nullable, first, last = False, set(), set()
+            for child in node[1]:
+                child_nullable, child_first, child_last = self.visit(child)
+                nullable = nullable or child_nullable
+                first |= child_first
+                last |= child_last
+            return nullable, first, last
+        if kind == 'cat':
+            nullable, first, last = True, set(), set()
+            for child in node[1]:
+                child_nullable, child_first, child_last = self.visit(child)
+                for pos in last:
+                    self.follow[pos] |= child_first
+                if nullable:
+                    first = first | child_first
+                last = last | child_last if child_nullable else child_last
+                nullable = nullable and child_nullable
+            return nullable, first, last
+        # 'star' | 'plus' | 'opt'
+        child_nullable, first, last = self.visit(node[1])
+        if kind != 'opt':
+            for pos in last:
+                self.follow[pos] |= first
+        return child_nullable or kind != 'plus', first, last
+
+    # 构建无epsilon边的位置自动机（Glushkov NFA）：状态0为起始状态，状态p+1对应位置p
+    def to_nfa(self):
+        nfa = FSA()
+        for i in range(len(self.chars)):
+            nfa.add_state()
+        for src, dsts in [(0, self.first)] + [(pos + 1, self.follow[pos])
+                                              for pos in range(len(self.chars))]:
+            for dst in sorted(dsts):
+                for char in sorted(self.chars[dst]):
+                    nfa.add_edge(src, dst + 1, char)
+        if self.nullable:
+            nfa.add_final(0)
+        for pos in sorted(self.last):
+            nfa.add_final(pos + 1)
+        return nfa
+
+    # 直接构造DFA：在表达式末尾加上结束标记位置#，DFA状态是“下一步可以匹配的位置”集合，
+    # 状态沿字符c转移到其中能匹配c的位置的followpos之并，含有#的状态为终止状态
+    def to_dfa(self):
+        end = len(self.chars)
+        follow = [self.follow[pos] | {end} if pos in self.last else self.follow[pos]
+                  for pos in range(end)]
+        start = frozenset(self.first | {end} if self.nullable else self.first)
+
+        dfa = FSA()
+        set_label = {start: 0}
+        pending = deque([start])
+        while pending:
+            positions = pending.popleft()
+            src = set_label[positions]
+            if end in positions:
+                dfa.add_final(src)
+            dst_sets = dict()
+            for pos in sorted(positions - {end}):
+                for char in self.chars[pos]:
+                    dst_sets.setdefault(char, set()).update(follow[pos])
+            for char in sorted(dst_sets):
+                dst_set = frozenset(dst_sets[char])
+                if dst_set not in set_label:
+                    set_label[dst_set] = dfa.add_state()
+                    pending.append(dst_set)
+                dfa.add_edge(src, set_label[dst_set], char)
+        dfa.finals.sort()
+        return dfa
+
+# 外部接口函数，构建正则表达式的位置自动机（无epsilon边的NFA）
+def parse(regex: str) -> FSA:
+    return _PositionAutomaton().build(regex).to_nfa()
+
+# 外部接口函数，直接由正则表达式构造DFA，不经过Thompson NFA
+def convert(regex: str) -> FSA:
+    return _PositionAutomaton().build(regex).to_dfa()
+
+# 主函数，用于从命令行比较两种构造方法得到的DFA大小
+def main():
+    import sys
+    from . import regex, nfa_to_dfa
+    print('position:', len(convert(sys.argv[1]).states), 'states')
+    print('thompson:', len(nfa_to_dfa.convert(regex.parse(sys.argv[1])).states), 'states')
+
+if __name__ == '__main__':
+    main()
+
+"""
+位置自动机（Position Automaton / Glushkov Automaton）
+Thompson 构造为每个运算符引入新的状态和 epsilon 边，子集构造时需要先 init_closure 再反复求闭包。
+位置自动机只为正则表达式中的每个字符（或字符范围）分配一个“位置”，直接在语法树上计算出位置之间的跟随关系，
+得到的自动机没有 epsilon 边。
+
+具体实现
+    _TreeParser 复用 regex._Parser 的文法和 parse_char/peek，只是构建语法树而不是 NFA，因此两者接受同样的正则表达式。
+    _PositionAutomaton.visit 后序遍历语法树，对每个结点计算：
+        nullable：能否匹配空串；
+        firstpos：匹配的串中可能作为第一个字符的位置；
+        lastpos：可能作为最后一个字符的位置；
+    同时填写 followpos(p)：在某个匹配的串中紧跟在位置p之后的位置。
+        连接 r1 r2：lastpos(r1) 中的每个位置都可以跟随 firstpos(r2) 中的位置；
+        重复 r* / r+：lastpos(r) 中的每个位置都可以跟随 firstpos(r) 中的位置。
+
+两种输出
+    to_nfa：Glushkov NFA，状态0为起始状态，位置p对应状态p+1，进入状态q+1的边都标记为位置q的字符，
+        可以直接交给 nfa_to_dfa.convert（没有 epsilon 边，闭包就是状态本身）。
+    to_dfa：在末尾加上结束标记#后直接做子集构造，DFA状态是位置集合，含#的集合为终止状态。
+        结果可以直接交给 dfa_minimizer.minimize。
+"""
@@ -0,0 +1,188 @@
+from collections import deque
+from .fsa import FSA
+from . import dfa_minimizer
+
+# 各种积运算的接受条件，None表示该分量已进入死状态
+_ACCEPT = {
+    'union': lambda a, b: a or b,
+    'intersection': lambda a, b: a and b,
+    'difference': lambda a, b: a and not b,
+}
+
+# 各种积运算中仍可能接受的状态对
+_ALIVE = {
+    'union': lambda a, b: a is not None or b is not None,
+    'intersection': lambda a, b: a is not None and b is not None,
+    'difference': lambda a, b: a is not None,
+}
+
+# 积自动机类，只探索从起始状态对可达的状态对
+class _Product:
+    def __init__(self, a: FSA, b: FSA, op: str):
+        self.op = op
+        self.accept = _ACCEPT[op]
+        self.alive = _ALIVE[op]
+        self.tables = list()
+        self.finals = list()
+        start = list()
+        for dfa in (a, b):
+            live = dfa.live_states()
+            start.append(0 if 0 in live else None)
+            # 死状态的边直接丢弃，缺少的边等价于进入死状态
+            self.tables.append([
+                dict((edge.val, edge.dst) for edge in state.edges
+                     if edge.dst in live) if index in live else dict()
+                for index, state in enumerate(dfa.states)])
+            self.finals.append(set(dfa.finals))
+        self.start = tuple(start)
+
+    # 判断状态对是否为终止状态
+    def is_final(self, pair):
+        return bool(self.accept(pair[0] in self.finals[0],
+                                pair[1] in self.finals[1]))
+
+    # 计算状态对的所有后继，跳过已经不可能接受的状态对
+    def successors(self, pair):
+        table_a = self.tables[0][pair[0]] if pair[0] is not None else {}
+        table_b = self.tables[1][pair[1]] if pair[1] is not None else {}
+        for val in sorted(table_a.keys() | table_b.keys()):
+            dst = (table_a.get(val), table_b.get(val))
+            if self.alive(*dst):
+                yield val, dst
+
+    # 构建积自动机
+    def build(self):
+        dfa = FSA()
+        if not self.alive(*self.start):
+            return dfa
+        label = {self.start: 0}
+        work = deque([self.start])
+        while work:
+            pair = work.popleft()
+            if self.is_final(pair):
+                dfa.add_final(label[pair])
+            for val, dst in self.successors(pair):
+                if dst not in label:
+                    label[dst] = dfa.add_state()
+                    work.append(dst)
+                dfa.add_edge(label[pair], label[dst], val)
+        return _trim(dfa)
+
+    # 广度优先查找最短的被接受字符串，找到即停止，空语言返回None
+    def witness(self):
+        if not self.alive(*self.start):
+            return None
+        parent = {self.start: None}
+        work = deque([self.start])
+        while work:
+            pair = work.popleft()
+            if self.is_final(pair):
+                chars = list()
+                while parent[pair] is not None:
+                    pair, val = parent[pair]
+                    chars.append(val)
+                return ''.join(reversed(chars))
+            for val, dst in self.successors(pair):
+                if dst not in parent:
+                    parent[dst] = (pair, val)
+                    work.append(dst)
+        return None
+
+# 删除无法到达终止状态的状态（起始状态0总是保留）
+def _trim(dfa: FSA):
+    live = dfa.live_states()
+    keep = [0] + [i for i in range(1, len(dfa.states)) if i in live]
+    to_new_state = dict((old, new) for new, old in enumerate(keep))
+    result = FSA()
+    for i in range(len(keep) - 1):
+        result.add_state()
+    for new, old in enumerate(keep):
+        if old in dfa.finals:
+            result.add_final(new)
+        for edge in dfa.states[old].edges:
+            if edge.dst in to_new_state:
+                result.add_edge(new, to_new_state[edge.dst], edge.val)
+    return result
+
+# 构造接受alphabet上所有字符串的单状态DFA
+def _universal(alphabet):
+    dfa = FSA()
+    dfa.add_final(0)
+    for val in sorted(set(alphabet)):
+        dfa.add_edge(0, 0, val)
+    return dfa
+
+# 外部接口函数，返回接受L(a) ∪ L(b)的最小DFA
+def union(a: FSA, b: FSA) -> FSA:
+    return dfa_minimizer.minimize(_Product(a, b, 'union').build())
+
+# 外部接口函数，返回接受L(a) ∩ L(b)的最小DFA
+def intersection(a: FSA, b: FSA) -> FSA:
+    return dfa_minimizer.minimize(_Product(a, b, 'intersection').build())
+
+# 外部接口函数，返回接受L(a) - L(b)的最小DFA
+def difference(a: FSA, b: FSA) -> FSA:
+    return dfa_minimizer.minimize(_Product(a, b, 'difference').build())
+
+# 外部接口函数，返回a在字母表alphabet上的补（默认使用a自身的字母表）
+def complement(a: FSA, alphabet=None) -> FSA:
+    if alphabet is None:
+        alphabet = [edge.val for state in a.states for edge in state.edges]
+    return difference(_universal(alphabet), a)
+
+# 外部接口函数，返回a接受的最短字符串，a为空语言时返回None
+def witness(a: FSA):
+    return _Product(a, FSA(), 'difference').witness()
+
+# 外部接口函数，判断a是否为空语言
+def is_empty(a: FSA) -> bool:
+    return witness(a) is None
+
+# 外部接口函数，判断L(a) ∩ L(b)是否为空，找到公共字符串即停止
+def is_disjoint(a: FSA, b: FSA) -> bool:
+    return _Product(a, b, 'intersection').witness() is None
+
+# 外部接口函数，返回属于L(a)但不属于L(b)的最短字符串，L(a) ⊆ L(b)时返回None
+def inclusion_witness(a: FSA, b: FSA):
+    return _Product(a, b, 'difference').witness()
+
+# 外部接口函数，判断L(a)是否包含于L(b)，找到反例即停止
+def is_subset(a: FSA, b: FSA) -> bool:
+    return inclusion_witness(a, b) is None
+
+# 主函数，用于从命令行计算两个正则表达式的差集DFA
+def main():
+    import sys
+    from .regex import parse
+    from .nfa_to_dfa import convert
+    from .utils import get_dot_file_path, dump
+    a = dfa_minimizer.minimize(convert(parse(sys.argv[1])))
+    b = dfa_minimizer.minimize(convert(parse(sys.argv[2])))
+    print('counterexample:', inclusion_witness(a, b))
+    dump(difference(a, b), get_dot_file_path('difference.dot'))
+
+if __name__ == '__main__':
+    main()
+
+"""
+积自动机构造（Product Construction）
+两个DFA的并、交、差都可以用积自动机表示：新状态是两个DFA状态组成的状态对，
+在同一个字符上两个分量同时转移，终止条件由运算决定（并：任一接受；交：都接受；差：前者接受且后者不接受）。
+
+具体实现
+
+按需构造：
+    从起始状态对出发广度优先，只生成可达的状态对，不会构造完整的 n×m 个状态。
+
+死状态剪枝：
+    预先计算每个DFA中能到达终止状态的状态，其余状态视为死状态（None）。
+    对于当前运算已经不可能接受的状态对（例如交运算中任一分量为None）直接丢弃，
+    构造完成后再删除剩余无法接受的状态，结果可以直接交给 dfa_minimizer.minimize。
+
+提前终止：
+    空语言判断和包含判断不需要完整的积自动机：广度优先过程中遇到第一个终止状态对即停止，
+    并沿父指针还原出最短的见证字符串。L(a) ⊆ L(b) 当且仅当 L(a) - L(b) 为空。
+
+补运算：
+    字母表是开放的，因此补运算需要指定字母表，实现为该字母表上的全语言与a的差。
+"""
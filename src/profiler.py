@@ -0,0 +1,135 @@
+import time
+from collections import Counter
+from .fsa import FSA
+from .lexer import Lexer, Token
+
+# 运行时剖析器类，用与Lexer.tokenize相同的最长匹配扫描输入，同时记录状态访问次数、
+# 每条转移的使用次数以及每种词法单元的数量、字符数和耗时
+class Profiler:
+    def __init__(self, lexer: Lexer):
+        self.lexer = lexer
+        self.reset()
+
+    # 清空统计信息
+    def reset(self):
+        self.visits = Counter()  # visits[state]为进入该状态的次数
+        self.transitions = Counter()  # transitions[(src, val)]为该转移的使用次数
+        self.tokens = Counter()  # 每种词法单元的数量
+        self.chars = Counter()  # 每种词法单元的字符数
+        self.seconds = Counter()  # 扫描每种词法单元的耗时
+
+    # 对完整的字符串进行词法分析并记录统计信息，结果与Lexer.tokenize相同
+    def tokenize(self, text: str):
+        table = self.lexer.table
+        accept = self.lexer.accept
+        kinds = self.lexer.kinds
+        visits = self.visits
+        transitions = self.transitions
+        pos = 0
+        while pos < len(text):
+            begin = time.perf_counter()
+            state = 0
+            visits[0] += 1
+            last_rule, last_end = -1, pos
+            scan = pos
+            while scan < len(text):
+                dst = table[state].get(text[scan])
+                if dst is None:
+                    break
+                transitions[state, text[scan]] += 1
+                state = dst
+                visits[state] += 1
+                scan += 1
+                if accept[state] >= 0:
+                    last_rule, last_end = accept[state], scan
+            if last_rule < 0:
+                raise SyntaxError('Unexpected character %r at position %d' % (text[pos], pos))
+            kind = kinds[last_rule]
+            self.tokens[kind] += 1
+            self.chars[kind] += last_end - pos
+            self.seconds[kind] += time.perf_counter() - begin
+            yield Token(kind, text[pos:last_end], pos)
+            pos = last_end
+
+    # 按访问次数从高到低返回前n个状态
+    def hot_states(self, n=None):
+        return [state for state, count in self.visits.most_common(n)]
+
+    # 按热度重新排列词法分析器的DFA，之后的统计信息使用新的状态编号
+    def relayout(self):
+        dfa, final_sets = relayout(self.lexer.dfa, self.lexer.final_sets, self.visits)
+        self.lexer.load(dfa, final_sets)
+        self.reset()
+        return self.lexer
+
+    # 将统计信息格式化为表格
+    def format_report(self, top=10) -> str:
+        total = sum(self.transitions.values())
+        lines = ['%-12s %10s %10s %10s %12s' % ('kind', 'tokens', 'chars', 'ms', 'chars/s')]
+        for kind in self.lexer.kinds:
+            seconds = self.seconds[kind]
+            lines.append('%-12s %10d %10d %10.3f %12.0f' % (
+                kind, self.tokens[kind], self.chars[kind], seconds * 1000,
+                self.chars[kind] / seconds if seconds else 0))
+        lines.append('')
+        lines.append('%-12s %10s %10s' % ('state', 'visits', 'share'))
+        for state, count in self.visits.most_common(top):
+            lines.append('%-12d %10d %9.1f%%' % (state, count,
+                                                 100.0 * count / max(1, sum(self.visits.values()))))
+        lines.append('')
+        lines.append('%-12s %10s %10s' % ('transition', 'count', 'share'))
+        for (src, val), count in self.transitions.most_common(top):
+            lines.append('%-12s %10d %9.1f%%' % ('%d %r' % (src, val), count,
+                                                 100.0 * count / max(1, total)))
+        return '\n'.join(lines)
+
+# 按访问次数从高到低重新编号DFA的状态，起始状态仍为0，次数相同时保持原来的顺序
+# 热的状态在转移表中相邻，扫描时访问的内存更集中
+def relayout(dfa: FSA, final_sets, visits):
+    order = sorted(range(1, len(dfa.states)), key=lambda state: (-visits.get(state, 0), state))
+    to_new_state = [0] * len(dfa.states)
+    for new, old in enumerate(order, 1):
+        to_new_state[old] = new
+    result = FSA()
+    for i in range(len(dfa.states) - 1):
+        result.add_state()
+    for old in [0] + order:
+        for edge in dfa.states[old].edges:
+            result.add_edge(to_new_state[old], to_new_state[edge.dst], edge.val)
+    new_final_sets = [set(to_new_state[state] for state in final_set) for final_set in final_sets]
+    result.finals = sorted(set().union(*new_final_sets))
+    return result, new_final_sets
+
+# 外部接口函数，用样本文本剖析词法分析器，返回Profiler
+def profile(lexer: Lexer, texts):
+    profiler = Profiler(lexer)
+    for text in texts:
+        for token in profiler.tokenize(text):
+            pass
+    return profiler
+
+# 主函数，用于从命令行剖析词法分析器，规则形如 kind=pattern
+def main():
+    import sys
+    rules = [arg.split('=', 1) for arg in sys.argv[2:]]
+    with open(sys.argv[1]) as file:
+        print(profile(Lexer(rules), [file.read()]).format_report())
+
+if __name__ == '__main__':
+    main()
+
+"""
+运行时剖析与按热度排列转移表（Profile-Guided Table Layout）
+大型词法分析器的DFA有成百上千个状态，但大部分输入只经过其中少数几个状态。
+规范化后的状态编号按广度优先顺序排列，与运行时的访问频率无关，热的状态可能分散在转移表的各处。
+
+剖析：
+    Profiler 是可选的：只有显式调用 Profiler.tokenize 时才记录统计信息，Lexer.tokenize 的速度不受影响。
+    它记录每个状态的进入次数、每条 (状态, 字符) 转移的使用次数，以及每种词法单元的数量、字符数和扫描耗时。
+
+重新排列：
+    relayout 按访问次数从高到低重新编号状态（起始状态始终为0），热的状态排在转移表的前面并且彼此相邻。
+    重新编号不改变DFA接受的语言和每个状态接受的规则，词法分析的结果完全相同。
+    Profiler.relayout 把结果装入词法分析器；之后用 shared.export 导出时，稠密转移表按新的编号逐行存储，
+    因此排列结果随编译产物一起保存。增加或删除规则后DFA会重新规范化，需要重新剖析。
+"""
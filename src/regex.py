@@ -1,6 +1,8 @@
 from .fsa import FSA
 # simple: char | range | '(' regexp ')'
 #
+# 开启captures时，'(' regexp ')' 同时是捕获组，按左括号出现的顺序编号
+#
 # repeating: simple '*' 
 #          | simple '+'
 #          | simple '?'
@@ -17,10 +19,12 @@ class _Parser:
     FORBIDDEN_CHAR = "+*?|()[]"  # 禁止直接使用的字符
 
     # 解析正则表达式入口方法
-    def parse(self, regex: str):
+    def parse(self, regex: str, captures=False):
         self.pos = 0  # 当前解析位置
         self.regex = regex  # 正则表达式字符串
         self.maxpos = len(self.regex)  # 正则表达式的最大位置
+        self.captures = captures  # 是否把括号作为捕获组
+        self.groups = 0  # 已解析的捕获组数量
         return self.parse_regexp()  # 解析正则表达式
 
     # 查看当前字符
@@ -76,12 +80,17 @@ class _Parser:
             if self.peek() == ')':
                 self.pos += 1
             else:
+                group = self.groups
+                if self.captures:
+                    self.groups += 1
                 fsa = self.parse_regexp()
                 if fsa:
                     if self.peek() != ')':
                         raise SyntaxError("Missing )")
                     else:
                         self.pos += 1
+                        if self.captures:
+                            return self.capture(fsa, group)
                         return fsa
                 else:
                     self.pos = pos
@@ -97,6 +106,16 @@ class _Parser:
         fsa.add_edge(0, final, self.parse_char())
         return fsa
 
+    # 用带标签的epsilon边包围子自动机：进入时记录标签2*group，离开时记录标签2*group+1
+    def capture(self, subfsa, group):
+        fsa = FSA()
+        final = fsa.add_final_state()
+        subfsa_begin = fsa.combine(subfsa)
+        subfsa_end = fsa.finals.pop()
+        fsa.add_edge_tag(0, subfsa_begin, 2 * group)
+        fsa.add_edge_tag(subfsa_end, final, 2 * group + 1)
+        return fsa
+
     # 解析重复表达式
     def parse_repeating(self):
         subfsa = self.parse_simple()
@@ -149,18 +168,19 @@ class _Parser:
         return fsa
 
 # 外部接口函数，解析正则表达式并返回FSA
-def parse(regex: str) -> FSA:
+# captures为True时括号成为捕获组，第k个捕获组（从0开始）的边界由标签2k和2k+1记录
+def parse(regex: str, captures=False) -> FSA:
     parser = _Parser()
-    return parser.parse(regex)
+    return parser.parse(regex, captures)
 
 # 主函数，用于从命令行解析正则表达式并生成对应的FSA
 def main():
     import sys
-    from utils import get_dot_file_path
+    from .utils import get_dot_file_path, dump
     fsa = parse(sys.argv[1])
     
     fsa_dot_path = get_dot_file_path('regex.dot')
-    fsa.dump(open(fsa_dot_path, 'w'))
+    dump(fsa, fsa_dot_path)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,145 @@
+from collections import deque
+from .fsa import FSA
+from . import regex, nfa_to_dfa, dfa_minimizer
+
+# 将DFA展开为转移表：table[state][val] = dst
+def _table(dfa: FSA):
+    return [dict((edge.val, edge.dst) for edge in state.edges)
+            for state in dfa.states]
+
+# 搜索器类，在任意位置查找匹配（最左最长语义）
+class _Searcher:
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        # 正向锚定DFA，每个候选起点在它上面运行一个线程
+        forward = dfa_minimizer.minimize(nfa_to_dfa.convert(regex.parse(pattern)))
+        self.forward = _table(forward)
+        self.forward_finals = set(forward.finals)
+
+    # 依次返回所有互不重叠的匹配(start, end)
+    # 只正向扫描一遍：每个位置启动一个线程，到达同一DFA状态的线程只保留起点最早的一个，
+    # 因此同时存活的线程数不超过DFA的状态数，每个字符只被处理常数次
+    def finditer(self, text: str, pos=0):
+        table = self.forward
+        finals = self.forward_finals
+        active = list()  # 存活的线程，按起点排序，DFA状态两两不同
+        queue = deque()  # 所有尚未输出的线程，按起点排序
+        next_pos = pos  # 下一个匹配的起点不能小于next_pos
+        for i in range(pos, len(text) + 1):
+            # 在位置i启动新线程，与已有线程处于同一状态时直接合并
+            thread = _Thread(i, 0, i if 0 in finals else None)
+            queue.append(thread)
+            holder = next((t for t in active if t.state == 0), None)
+            if holder is None:
+                active.append(thread)
+            else:
+                thread.merge(holder, i)
+
+            if i < len(text):
+                char = text[i]
+                survivors = list()
+                reached = dict()
+                for thread in active:
+                    dst = table[thread.state].get(char)
+                    if dst is None:
+                        thread.state = None
+                        continue
+                    if dst in finals:
+                        thread.end = i + 1
+                    if dst in reached:
+                        thread.merge(reached[dst], i + 1)
+                        continue
+                    thread.state = dst
+                    reached[dst] = thread
+                    survivors.append(thread)
+                active = survivors
+            else:
+                for thread in active:
+                    thread.state = None
+
+            # 按起点顺序输出已经结束的线程，起点更早的线程结束前不能输出
+            while queue and queue[0].state is None:
+                thread = queue.popleft()
+                end = thread.resolve()
+                if end is None or thread.start < next_pos:
+                    continue
+                yield thread.start, end
+                # 空匹配后向前移动一个字符，避免死循环
+                next_pos = end if end > thread.start else end + 1
+
+    # 返回第一个匹配，没有匹配时返回None；找到后立即停止扫描
+    def search(self, text: str, pos=0):
+        return next(self.finditer(text, pos), None)
+
+# 搜索线程：从start开始的锚定匹配，end为目前的最长匹配终点
+# 合并到起点更早的线程parent之后，两者在merge_pos之后的前途完全相同，
+# 因此parent在merge_pos之后的匹配终点也是本线程的匹配终点
+class _Thread:
+    __slots__ = ('start', 'state', 'end', 'parent', 'merge_pos')
+
+    def __init__(self, start, state, end):
+        self.start = start
+        self.state = state  # 为None表示线程已结束
+        self.end = end
+        self.parent = None
+        self.merge_pos = None
+
+    def merge(self, parent, merge_pos):
+        self.state = None
+        self.parent = parent
+        self.merge_pos = merge_pos
+
+    # 计算最终的最长匹配终点；parent的起点更早，此时已经先被输出队列处理过
+    def resolve(self):
+        if self.parent is not None:
+            end = self.parent.end
+            if end is not None and end > self.merge_pos:
+                self.end = end
+            self.parent = None
+        return self.end
+
+# 外部接口函数，编译正则表达式以便重复搜索
+def compile(pattern: str) -> _Searcher:
+    return _Searcher(pattern)
+
+# 外部接口函数，查找第一个匹配，返回(start, end)或None
+def search(pattern, text: str, pos=0):
+    if isinstance(pattern, str):
+        pattern = _Searcher(pattern)
+    return pattern.search(text, pos)
+
+# 外部接口函数，依次返回所有互不重叠的匹配(start, end)
+def finditer(pattern, text: str, pos=0):
+    if isinstance(pattern, str):
+        pattern = _Searcher(pattern)
+    return pattern.finditer(text, pos)
+
+# 主函数，用于从命令行在文本中查找所有匹配
+def main():
+    import sys
+    text = sys.argv[2]
+    for start, end in finditer(sys.argv[1], text):
+        print(start, end, text[start:end])
+
+if __name__ == '__main__':
+    main()
+
+"""
+非锚定搜索（Unanchored Search）
+锚定的DFA只能从位置0开始匹配，若在每个偏移处重新启动匹配并扫描到死状态，查找所有匹配的复杂度为 O(n²)。
+
+具体实现
+
+线程：
+    正向扫描文本一遍，在每个位置启动一个从锚定DFA起始状态出发的线程，所有存活的线程随每个字符同步前进，
+    每个线程记录自己的起点和目前的最长匹配终点。线程进入死状态时结束。
+
+合并：
+    两个线程到达同一个DFA状态后，之后经过的状态完全相同，只保留起点更早的一个；被合并的线程记下合并的位置，
+    输出时取“合并前自己的终点”与“起点更早的线程在合并位置之后的终点”中较大的一个。
+    因此同时存活的线程数不超过DFA的状态数，整个搜索为 O(n · 状态数)，与文本长度成线性关系，没有重复扫描。
+
+最左最长语义：
+    线程按起点顺序排队，队首的线程结束后它的最长匹配才能确定；起点不小于上一个匹配终点的第一个有匹配的线程，
+    就是下一个最左最长匹配。search 在得到第一个匹配后立即停止，不会扫描整个文本。
+"""
@@ -0,0 +1,185 @@
+import json
+import mmap
+import sys
+from array import array
+from multiprocessing import shared_memory
+from .fsa import FSA
+from .lexer import Lexer, Token
+
+MAGIC = 0x444c5854  # 'TXLD'
+VERSION = 1
+# 头部字段：MAGIC, VERSION, 状态数, 字符数, 规则数, 规则名字节数
+HEADER_SIZE = 6
+
+# 将DFA序列化为连续的int32数组：头部、字母表、接受向量、转移表，最后是规则名（UTF-8 JSON）
+def _serialize(dfa: FSA, final_sets, kinds):
+    alphabet = sorted(set(edge.val for state in dfa.states for edge in state.edges))
+    column = dict((val, index) for index, val in enumerate(alphabet))
+    accept = array('i', [-1] * len(dfa.states))
+    for rule_index in range(len(final_sets) - 1, -1, -1):
+        for state in final_sets[rule_index]:
+            accept[state] = rule_index
+    table = array('i', [-1] * (len(dfa.states) * len(alphabet)))
+    for src, state in enumerate(dfa.states):
+        for edge in state.edges:
+            table[src * len(alphabet) + column[edge.val]] = edge.dst
+    names = json.dumps(list(kinds)).encode('utf-8')
+    header = array('i', [MAGIC, VERSION, len(dfa.states), len(alphabet),
+                         len(final_sets), len(names)])
+    codes = array('i', [ord(val) for val in alphabet])
+    return header.tobytes() + codes.tobytes() + accept.tobytes() + table.tobytes() + names
+
+# 共享内存或映射文件中的只读DFA，转移表和接受向量直接引用底层内存，不做反序列化
+class SharedDFA:
+    def __init__(self, buffer, owner=None):
+        self.owner = owner  # SharedMemory或mmap对象，close时一并关闭
+        self.buffer = memoryview(buffer).toreadonly()
+        words = self.buffer.cast('B')[:HEADER_SIZE * 4].cast('i')
+        magic, version, num_states, num_symbols, num_rules, names_size = words
+        words.release()
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a compiled DFA')
+        offset = HEADER_SIZE * 4
+        self.alphabet = self.view(offset, num_symbols)
+        offset += num_symbols * 4
+        self.accept = self.view(offset, num_states)
+        offset += num_states * 4
+        self.transitions = self.view(offset, num_states * num_symbols)
+        offset += num_states * num_symbols * 4
+        self.kinds = json.loads(bytes(self.buffer[offset:offset + names_size]))
+        self.num_states = num_states
+        self.num_symbols = num_symbols
+        # 字母表很小，只有它被展开为字典以便按字符查找列号
+        self.columns = dict((chr(code), index) for index, code in enumerate(self.alphabet))
+
+    # 返回从offset开始的count个int32的只读视图
+    def view(self, offset, count):
+        return self.buffer[offset:offset + count * 4].cast('i')
+
+    # 单步转移，没有对应的边时返回None
+    def step(self, state, val):
+        column = self.columns.get(val)
+        if column is None:
+            return None
+        dst = self.transitions[state * self.num_symbols + column]
+        return dst if dst >= 0 else None
+
+    # 完整匹配text，返回接受的规则编号，不匹配时返回-1
+    def match(self, text: str) -> int:
+        state = 0
+        for val in text:
+            state = self.step(state, val)
+            if state is None:
+                return -1
+        return self.accept[state]
+
+    # 对字符串进行词法分析，最长匹配直接在稠密转移表上进行，结果与Lexer.tokenize相同
+    def tokenize(self, text: str):
+        transitions = self.transitions
+        columns = self.columns
+        num_symbols = self.num_symbols
+        accept = self.accept
+        kinds = self.kinds
+        pos = 0
+        while pos < len(text):
+            state = 0
+            last_rule, last_end = -1, pos
+            scan = pos
+            while scan < len(text):
+                column = columns.get(text[scan])
+                if column is None:
+                    break
+                state = transitions[state * num_symbols + column]
+                if state < 0:
+                    break
+                scan += 1
+                if accept[state] >= 0:
+                    last_rule, last_end = accept[state], scan
+            if last_rule < 0:
+                raise SyntaxError('Unexpected character %r at position %d' % (text[pos], pos))
+            yield Token(kinds[last_rule], text[pos:last_end], pos)
+            pos = last_end
+
+    # 释放对底层内存的引用
+    def close(self):
+        for view in (self.alphabet, self.accept, self.transitions, self.buffer):
+            view.release()
+        if self.owner is not None:
+            self.owner.close()
+            self.owner = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# 取出DFA、终止状态集和规则名，source可以是Lexer或最小DFA
+def _unpack(source, final_sets, kinds):
+    if isinstance(source, Lexer):
+        return source.dfa, source.final_sets, source.kinds
+    if final_sets is None:
+        final_sets = (set(source.finals),)
+    if kinds is None:
+        kinds = [str(index) for index in range(len(final_sets))]
+    return source, final_sets, kinds
+
+# 外部接口函数，将编译结果导出到共享内存，返回SharedMemory对象（由调用者负责unlink）
+def export(source, final_sets=None, kinds=None, name=None):
+    data = _serialize(*_unpack(source, final_sets, kinds))
+    shm = shared_memory.SharedMemory(name=name, create=True, size=len(data))
+    shm.buf[:len(data)] = data
+    return shm
+
+# 外部接口函数，将编译结果导出到文件，之后可以用attach_file映射
+def export_file(path, source, final_sets=None, kinds=None):
+    with open(path, 'wb') as file:
+        file.write(_serialize(*_unpack(source, final_sets, kinds)))
+
+# 外部接口函数，以只读方式连接到共享内存中的编译结果
+def attach(name) -> SharedDFA:
+    # 连接方不拥有这块内存，不能让resource_tracker在进程退出时删除它
+    if sys.version_info >= (3, 13):
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+    return SharedDFA(shm.buf, shm)
+
+# 外部接口函数，以只读方式映射文件中的编译结果
+def attach_file(path) -> SharedDFA:
+    with open(path, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return SharedDFA(mapped, mapped)
+
+# 主函数，用于把词法规则编译到文件，规则形如 kind=pattern
+def main():
+    rules = [arg.split('=', 1) for arg in sys.argv[2:]]
+    export_file(sys.argv[1], Lexer(rules))
+
+if __name__ == '__main__':
+    main()
+
+"""
+跨进程共享编译结果（Shared Compiled Tables）
+预先fork的多个工作进程如果各自编译同一个词法分析器，启动时间和常驻内存都会成倍增加。
+把编译好的DFA导出到 multiprocessing.shared_memory 或者文件中，其他进程只读地映射同一块内存即可直接使用。
+
+内存布局（本机字节序的int32）：
+    头部：MAGIC、VERSION、状态数、字符数、规则数、规则名字节数
+    字母表：按码点排序的字符
+    接受向量：每个状态接受的规则编号，不接受时为-1
+    转移表：状态数 × 字符数的稠密矩阵，没有边时为-1
+    规则名：UTF-8编码的JSON列表
+
+连接方：
+    SharedDFA 用 memoryview.cast 直接引用转移表和接受向量，不复制也不反序列化；
+    只有很小的字母表被展开为字典。tokenize 有自己的扫描循环，直接按 transitions[state * 字符数 + 列号] 取下一个状态，
+    不为每一行构造字典或包装对象。
+    导出方负责在所有进程退出后调用 SharedMemory.unlink。
+"""
@@ -5,10 +5,6 @@ import shutil
 DOT_FOLDER = './res/dot'
 IMAGE_FOLDER = './res/img'
 
-# 如果目录不存在，则创建目录
-os.makedirs(DOT_FOLDER, exist_ok=True)
-os.makedirs(IMAGE_FOLDER, exist_ok=True)
-
 # 获取DOT文件的完整路径
 def get_dot_file_path(filename):
     return os.path.join(DOT_FOLDER, filename)
@@ -17,8 +13,10 @@ def get_dot_file_path(filename):
 def get_image_file_path(filename):
     return os.path.join(IMAGE_FOLDER, filename)
 
-# 清空指定目录
+# 清空指定目录，目录不存在时什么也不做
 def clear_directory(directory):
+    if not os.path.isdir(directory):
+        return
     for filename in os.listdir(directory):
         file_path = os.path.join(directory, filename)
         if os.path.isfile(file_path) or os.path.islink(file_path):
@@ -26,8 +24,11 @@ def clear_directory(directory):
         elif os.path.isdir(file_path):
             shutil.rmtree(file_path)  # 删除目录
 
-# 将自动机对象输出为DOT文件（修正后的版本）
+# 将自动机对象输出为DOT文件（修正后的版本），所在目录不存在时先创建
 def dump(automaton, filename):
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
     with open(filename, 'w') as file:
         file.write('digraph G {\n')
         file.write('rankdir=LR;\n')  # 从左到右的布局
@@ -3,6 +3,11 @@ from src.fsa import State, Edge, FSA
 from src.regex import parse
 from src.nfa_to_dfa import convert as nfa_to_dfa_convert
 from src.dfa_minimizer import minimize as dfa_minimizer
+from src import search, product, canonical, lexer, nfa_passes, shared, capture, position, engines, profiler
+import subprocess
+import sys
+import tempfile
+import asyncio
 import os
 
 class TestFSA(unittest.TestCase):
@@ -71,6 +76,17 @@ class TestNFAtoDFA(unittest.TestCase):
         self.assertIsInstance(dfa, FSA)
         self.assertGreater(len(dfa.states), 0)
 
+    def test_parallel_matches_sequential(self):
+        from src.nfa_to_dfa import _ParallelNFAToDFA
+        nfa = parse('(a|b)*a' + '(a|b)' * 6)
+        final_sets = (set(nfa.finals),)
+        layout = lambda dfa: ([[(edge.dst, edge.val) for edge in state.edges]
+                               for state in dfa.states], dfa.finals)
+        sequential = nfa_to_dfa_convert(nfa)
+        parallel = _ParallelNFAToDFA(workers=2, min_frontier=4).convert(nfa, final_sets)[0]
+        self.assertEqual(len(sequential.states), 129)
+        self.assertEqual(layout(parallel), layout(sequential))
+
 class TestDFAMinimizer(unittest.TestCase):
 
     def test_dfa_minimizer(self):
@@ -82,5 +98,380 @@ class TestDFAMinimizer(unittest.TestCase):
         self.assertGreater(len(minimized_dfa.states), 0)
         self.assertLessEqual(len(minimized_dfa.states), len(dfa.states))
 
+    def test_distinct_states_limit_pair_comparisons(self):
+        from src.dfa_minimizer import _Minimizer
+        # 最小DFA后面接一个与状态1等价的新状态，只有涉及新状态的状态对需要比较
+        dfa = dfa_minimizer(nfa_to_dfa_convert(parse('(a|b)*a(a|b)(a|b)(a|b)')))
+        n = len(dfa.states)
+        copy = dfa.add_state()
+        for edge in dfa.states[1].edges:
+            dfa.add_edge(copy, edge.dst, edge.val)
+        if 1 in dfa.finals:
+            dfa.add_final(copy)
+        minimizer = _Minimizer()
+        pairs = list()
+        process_state = minimizer.process_state
+        minimizer.process_state = lambda x, y: pairs.append((x, y)) or process_state(x, y)
+        result, final_sets = minimizer.minimize(dfa, (set(dfa.finals),), range(n))
+        self.assertEqual(len(result.states), n)
+        self.assertLess(len(pairs), n)
+        self.assertTrue(all(copy in pair for pair in pairs))
+
+class TestSearch(unittest.TestCase):
+
+    def test_search_leftmost_longest(self):
+        self.assertEqual(search.search('axyz|x', 'qaxyz'), (1, 5))
+        self.assertEqual(search.search('a(b|c)*d', 'xxabcbdab'), (2, 7))
+        self.assertIsNone(search.search('ab', 'ba'))
+
+    def test_finditer(self):
+        text = 'ab ab aab b'
+        self.assertEqual(list(search.finditer('a+b', text)),
+                         [(0, 2), (3, 5), (6, 9)])
+
+    def test_finditer_empty_matches(self):
+        self.assertEqual(list(search.finditer('a*', 'baa')),
+                         [(0, 0), (1, 3), (3, 3)])
+
+    # 让searcher的转移表统计查表次数
+    def count_steps(self, searcher):
+        calls = [0]
+
+        class CountingRow(dict):
+            def get(self, *args):
+                calls[0] += 1
+                return dict.get(self, *args)
+
+        searcher.forward = [CountingRow(row) for row in searcher.forward]
+        return calls
+
+    def test_linear_scaling(self):
+        searcher = search.compile('a|a*b')
+        calls = self.count_steps(searcher)
+        for n in (1000, 8000):
+            calls[0] = 0
+            self.assertEqual(len(list(searcher.finditer('a' * n))), n)
+            self.assertLessEqual(calls[0], 3 * n)
+
+    def test_search_stops_at_first_match(self):
+        searcher = search.compile('x[a-z]*')
+        calls = self.count_steps(searcher)
+        self.assertEqual(searcher.search('xab ' + 'q' * 100000), (0, 3))
+        self.assertLess(calls[0], 10)
+
+class TestProduct(unittest.TestCase):
+
+    def compile(self, regex_str):
+        return dfa_minimizer(nfa_to_dfa_convert(parse(regex_str)))
+
+    def test_difference(self):
+        identifiers = self.compile('[a-z]+')
+        keywords = self.compile('if|in')
+        result = product.difference(identifiers, keywords)
+        self.assertIsNone(product.inclusion_witness(result, identifiers))
+        self.assertTrue(product.is_disjoint(result, keywords))
+        self.assertFalse(product.is_empty(result))
+
+    def test_intersection_empty(self):
+        result = product.intersection(self.compile('a+'), self.compile('b+'))
+        self.assertTrue(product.is_empty(result))
+        self.assertEqual(len(result.states), 1)
+
+    def test_inclusion_witness(self):
+        self.assertTrue(product.is_subset(self.compile('ab'), self.compile('(ab)*')))
+        self.assertEqual(product.inclusion_witness(self.compile('(ab)*'), self.compile('ab')), '')
+
+    def test_complement(self):
+        result = product.complement(self.compile('ab'))
+        self.assertEqual(product.witness(result), '')
+        self.assertTrue(product.is_disjoint(result, self.compile('ab')))
+
+class TestCanonical(unittest.TestCase):
+
+    def test_equivalent(self):
+        self.assertTrue(canonical.equivalent('a*', '(a|aa)*'))
+        self.assertTrue(canonical.equivalent('(ab)*a', 'a(ba)*'))
+        self.assertFalse(canonical.equivalent('ab', 'ba'))
+
+    def test_empty_language(self):
+        self.assertTrue(canonical.equivalent('[z-a]', 'a*[z-a]'))
+        self.assertEqual(canonical.pattern_fingerprint('[z-a]'),
+                         canonical.pattern_fingerprint('(a|b)*[z-a]c'))
+        self.assertEqual(len(canonical.compile('a*[z-a]').states), 1)
+
+    def test_shared_table(self):
+        self.assertIs(canonical.compile('[a-c]'), canonical.compile('a|b|c'))
+
+    def test_canonicalize_is_stable(self):
+        dfa = dfa_minimizer(nfa_to_dfa_convert(parse('a(b|c)*d')))
+        once = canonical.canonicalize(dfa)
+        self.assertEqual(canonical.fingerprint(once), canonical.fingerprint(dfa))
+        self.assertEqual([[(e.val, e.dst) for e in s.edges] for s in once.states],
+                         [[('a', 1)], [('b', 1), ('c', 1), ('d', 2)], []])
+
+class TestLexer(unittest.TestCase):
+
+    RULES = [('IF', 'if'), ('ID', '[a-z][a-z0-9]*'), ('NUM', '[0-9]+(.[0-9]+)?'),
+             ('WS', '[ \n]+'), ('OP', '[\\-\\+=<>]|<=|>=')]
+    TEXT = 'if x1 >= 10.5\nifx = 3'
+
+    def test_tokenize_priority_and_longest_match(self):
+        tokens = list(lexer.tokenize(self.TEXT, self.RULES))
+        self.assertEqual([t.kind for t in tokens if t.kind != 'WS'],
+                         ['IF', 'ID', 'OP', 'NUM', 'ID', 'OP', 'NUM'])
+        self.assertEqual(''.join(t.text for t in tokens), self.TEXT)
+
+    def test_tokenize_error(self):
+        with self.assertRaises(SyntaxError):
+            list(lexer.tokenize('x $', self.RULES))
+
+    def test_atokenize_matches_tokenize(self):
+        rules = lexer.compile(self.RULES)
+
+        async def collect():
+            reader = asyncio.StreamReader()
+            reader.feed_data(self.TEXT.encode())
+            reader.feed_eof()
+            return [token async for token in lexer.atokenize(reader, rules, chunk_size=3)]
+
+        self.assertEqual(asyncio.run(collect()), list(rules.tokenize(self.TEXT)))
+
+    def test_tokenize_parallel_matches_sequential(self):
+        rules = lexer.Lexer(self.RULES + [('STR', '"[a-z ]*"')])
+        text = ' '.join(['if x1 >= 10.5', '"a b c"', 'ifx = 3', '"if x"'] * 20)
+        expected = list(rules.tokenize(text))
+        for chunk_size in (5, 17, 64):
+            self.assertEqual(list(rules.tokenize_parallel(text, workers=2, chunk_size=chunk_size,
+                                                          overlap=4)), expected)
+        self.assertEqual(list(lexer.tokenize_parallel(text, rules, workers=2, chunk_size=17,
+                                                      overlap=4)), expected)
+        self.assertEqual(rules.spans_parallel(text, workers=2, chunk_size=17), rules.spans(text))
+        self.assertEqual([(rules.kinds[rule], text[begin:end], begin) for rule, begin, end
+                          in zip(*[iter(rules.spans(text))] * 3)], expected)
+
+    def test_parallel_resyncs_inside_tokens(self):
+        # 块的边界落在字符串中间时，推测扫描仍能从真实的入口状态继续，主进程不需要顺序扫描
+        rules = lexer.Lexer([('STR', '"[a-z ]*"'), ('ID', '[a-z]+'), ('WS', ' +')])
+        text = '"a b c d e f g h" x ' * 500
+        bounds = list(range(0, len(text), 997)) + [len(text)]
+        lexer._init_worker(rules.table, rules.accept)
+        results = [lexer._lex_chunk(text[start:stop + 64], start, stop - start,
+                                    stop + 64 >= len(text))
+                   for start, stop in zip(bounds, bounds[1:])]
+        fallbacks = list()
+        longest_match = lexer._longest_match
+        lexer._longest_match = lambda *args: fallbacks.append(args[3]) or longest_match(*args)
+        try:
+            spans = rules.stitch(text, bounds, results)
+        finally:
+            lexer._longest_match = longest_match
+        self.assertEqual(list(rules.materialize(text, spans, batch=7)), list(rules.tokenize(text)))
+        self.assertEqual(fallbacks, [])
+
+    def test_tokenize_parallel_error(self):
+        rules = lexer.Lexer(self.RULES)
+        with self.assertRaises(SyntaxError):
+            rules.tokenize_parallel('if x1 ' * 20 + '$', workers=2, chunk_size=16)
+
+    def assertSameLexer(self, incremental, rules):
+        scratch = lexer.Lexer(rules)
+        self.assertEqual(incremental.rules, scratch.rules)
+        self.assertEqual(incremental.table, scratch.table)
+        self.assertEqual(incremental.accept, scratch.accept)
+
+    def test_add_rule_matches_scratch(self):
+        rules = lexer.Lexer(self.RULES)
+        rules.add_rule('THEN', 'then', index=0)
+        self.assertSameLexer(rules, [('THEN', 'then')] + self.RULES)
+        rules.add_rule('STR', '"[a-z ]*"')
+        self.assertSameLexer(rules, [('THEN', 'then')] + self.RULES + [('STR', '"[a-z ]*"')])
+
+    def test_remove_rule_matches_scratch(self):
+        rules = lexer.Lexer(self.RULES)
+        rules.remove_rule('IF')
+        self.assertSameLexer(rules, self.RULES[1:])
+        rules.remove_rule('WS')
+        self.assertSameLexer(rules, [r for r in self.RULES[1:] if r[0] != 'WS'])
+
+class TestNFAPasses(unittest.TestCase):
+
+    def test_passes_preserve_language(self):
+        for regex_str in ['a(b|c)*d', '((a|b)*c?)+d', '(ab|a)*']:
+            nfa = parse(regex_str)
+            optimized = nfa_passes.optimize(nfa)
+            self.assertEqual(canonical.fingerprint(dfa_minimizer(nfa_to_dfa_convert(nfa))),
+                             canonical.fingerprint(dfa_minimizer(nfa_to_dfa_convert(optimized))))
+            self.assertLess(len(optimized.states), len(nfa.states))
+
+    def test_remove_epsilon(self):
+        optimized = nfa_passes.optimize(parse('a*b'), passes=['remove_epsilon'])
+        self.assertTrue(all(edge.val != 0 for state in optimized.states for edge in state.edges))
+
+    def test_report(self):
+        nfa = parse('(a|b)*c')
+        manager = nfa_passes.PassManager()
+        manager.run(nfa, (set(nfa.finals),))
+        self.assertEqual([stats.name for stats in manager.report], list(nfa_passes.DEFAULT_PASSES))
+        self.assertEqual(manager.report[0].states_before, len(nfa.states))
+        self.assertIn('merge_equivalent', manager.format_report())
+
+class TestShared(unittest.TestCase):
+
+    RULES = [('IF', 'if'), ('ID', '[a-z][a-z0-9]*'), ('NUM', '[0-9]+'), ('WS', ' +')]
+    TEXT = 'if x1 10 ifx'
+
+    def test_shared_memory_roundtrip(self):
+        rules = lexer.Lexer(self.RULES)
+        shm = shared.export(rules)
+        try:
+            with shared.attach(shm.name) as dfa:
+                self.assertEqual(dfa.kinds, ['IF', 'ID', 'NUM', 'WS'])
+                self.assertEqual(dfa.match('if'), 0)
+                self.assertEqual(dfa.match('ifx'), 1)
+                self.assertEqual(dfa.match('1x'), -1)
+                self.assertEqual(list(dfa.tokenize(self.TEXT)), list(rules.tokenize(self.TEXT)))
+                with self.assertRaisesRegex(SyntaxError, 'position 3'):
+                    list(dfa.tokenize('if $'))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def test_file_roundtrip(self):
+        dfa = dfa_minimizer(nfa_to_dfa_convert(parse('a(b|c)*d')))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dfa.bin')
+            shared.export_file(path, dfa)
+            with shared.attach_file(path) as view:
+                self.assertEqual(view.match('abccd'), 0)
+                self.assertEqual(view.match('abc'), -1)
+                with self.assertRaises(TypeError):
+                    view.transitions[0] = 1
+
+class TestCapture(unittest.TestCase):
+
+    def test_parse_captures_adds_tags(self):
+        tags = [edge.tag for state in parse('(a)(b)', captures=True).states
+                for edge in state.edges if edge.tag is not None]
+        self.assertEqual(sorted(tags), [0, 1, 2, 3])
+        self.assertFalse(any(edge.tag is not None for state in parse('(a)(b)').states
+                             for edge in state.edges))
+
+    def test_groups(self):
+        self.assertEqual(capture.groups('(a|ab)(c|bcd)(d*)', 'abcd'), ['abcd', 'a', 'bcd', ''])
+        self.assertEqual(capture.groups('([a-z]+)=([0-9]+)', 'key=42'), ['key=42', 'key', '42'])
+        self.assertIsNone(capture.groups('(a)b', 'ac'))
+
+    def test_repeated_and_optional_groups(self):
+        self.assertEqual(capture.fullmatch('(a(b)?)+', 'aba'), [(0, 3), (2, 3), (1, 2)])
+        self.assertEqual(capture.fullmatch('((a)|b)*', 'ab'), [(0, 2), (1, 2), (0, 1)])
+
+    def test_nullable_loop_body_keeps_last_nonempty_iteration(self):
+        # 与Laurikari的TDFA一致，不记录末尾的空迭代（re.fullmatch 会给出 (2, 2) 和 (3, 3)）
+        self.assertEqual(capture.fullmatch('(a?)*', 'aa'), [(0, 2), (1, 2)])
+        self.assertEqual(capture.fullmatch('b((bb)?)*', 'bbb'), [(0, 3), (1, 3), (1, 3)])
+        self.assertEqual(capture.fullmatch('(a?)*', ''), [(0, 0), (0, 0)])
+
+    def test_match_longest_prefix(self):
+        self.assertEqual(capture.match('([0-9]+)(.[0-9]+)?', '3.14 rest'),
+                         [(0, 4), (0, 1), (1, 4)])
+
+class TestProfiler(unittest.TestCase):
+
+    RULES = TestLexer.RULES
+    TEXT = TestLexer.TEXT * 20
+
+    def test_profiled_tokenize_matches_lexer(self):
+        rules = lexer.Lexer(self.RULES)
+        prof = profiler.Profiler(rules)
+        self.assertEqual(list(prof.tokenize(self.TEXT)), list(rules.tokenize(self.TEXT)))
+        self.assertEqual(prof.tokens['IF'], 20)
+        self.assertEqual(prof.chars['WS'], 6 * 20)
+        self.assertEqual(sum(prof.chars.values()), len(self.TEXT))
+        self.assertEqual(prof.visits[0], sum(prof.tokens.values()))
+        self.assertEqual(sum(prof.transitions.values()) + prof.visits[0], sum(prof.visits.values()))
+
+    def test_relayout_orders_states_by_hotness(self):
+        rules = lexer.Lexer(self.RULES)
+        expected = list(rules.tokenize(self.TEXT))
+        prof = profiler.profile(rules, [self.TEXT])
+        visits = [prof.visits[state] for state in range(1, len(rules.dfa.states))]
+        prof.relayout()
+        self.assertEqual(list(rules.tokenize(self.TEXT)), expected)
+        prof = profiler.profile(rules, [self.TEXT])
+        self.assertEqual([prof.visits[state] for state in range(1, len(rules.dfa.states))],
+                         sorted(visits, reverse=True))
+
+    def test_relayout_is_saved_by_export(self):
+        rules = lexer.Lexer(self.RULES)
+        profiler.profile(rules, [self.TEXT]).relayout()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'lexer.bin')
+            shared.export_file(path, rules)
+            with shared.attach_file(path) as view:
+                self.assertEqual(list(view.accept), rules.accept)
+                self.assertEqual(list(view.tokenize(self.TEXT)), list(rules.tokenize(self.TEXT)))
+
+class TestPosition(unittest.TestCase):
+
+    PATTERNS = ['a', 'a|b', '(ab)*c', '[a-c]+d?', '(a|b)*abb', '((a|b)(c|d))*',
+                'a?b?c?', '(a*)*', 'x(y|z)+w*', '[]', '\\+a', '(a)(b)(c)']
+
+    def test_same_language_as_thompson(self):
+        for pattern in self.PATTERNS:
+            expected = canonical.fingerprint(engines.to_dfa(pattern, 'thompson'))
+            self.assertEqual(canonical.fingerprint(engines.to_dfa(pattern, 'position')), expected)
+            glushkov = dfa_minimizer(nfa_to_dfa_convert(position.parse(pattern)))
+            self.assertEqual(canonical.fingerprint(glushkov), expected)
+
+    def test_nfa_has_no_epsilon_edges(self):
+        nfa = position.parse('(a|b)*abb')
+        self.assertEqual(len(nfa.states), 6)
+        self.assertFalse(any(edge.val == 0 for state in nfa.states for edge in state.edges))
+
+    def test_direct_dfa(self):
+        dfa = position.convert('(a|b)*abb')
+        self.assertEqual(len(dfa.states), 4)
+        self.assertEqual(dfa.finals, [3])
+        self.assertEqual(position.convert('a*').finals, [0])
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            engines.to_dfa('a', 'backtracking')
+
+class TestAPI(unittest.TestCase):
+
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    # 在空的临时目录中运行代码，返回标准输出和运行后目录中的文件
+    def run_isolated(self, code):
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, PYTHONPATH=self.ROOT)
+            output = subprocess.run([sys.executable, '-c', code], cwd=directory, env=env,
+                                    check=True, capture_output=True, text=True).stdout
+            return output, os.listdir(directory)
+
+    def test_import_has_no_side_effects(self):
+        output, files = self.run_isolated(
+            'import sys, src, src.utils, src.lexer\n'
+            'src.compile("ab*")\n'
+            'print(sorted(m for m in ("asyncio", "concurrent.futures", "src.shared", "src.position")\n'
+            '             if m in sys.modules))')
+        self.assertEqual(files, [])
+        self.assertEqual(output.strip(), '[]')
+
+    def test_dump_creates_output_directory(self):
+        output, files = self.run_isolated(
+            'import src\n'
+            'src.utils.dump(src.compile("ab"), src.utils.get_dot_file_path("dfa.dot"))')
+        self.assertEqual(files, ['res'])
+
+    def test_compile_engines(self):
+        import src
+        expected = canonical.fingerprint(src.compile('(a|b)*abb'))
+        self.assertEqual(canonical.fingerprint(src.compile('(a|b)*abb', engine='position')), expected)
+        self.assertEqual(canonical.fingerprint(FSA.from_regex('(a|b)*abb')),
+                         canonical.fingerprint(src.compile('(a|b)*abb', minimize=False)))
+        self.assertIs(src.lexer, lexer)
+
 if __name__ == '__main__':
     unittest.main()